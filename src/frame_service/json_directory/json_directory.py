@@ -21,7 +21,9 @@ class JsonDirectory(FrameService):
         except Exception as e:
             raise Exception(f"Could not load character meta data from {char_meta_dir}") from e
 
-    def get_frame_data(self, character: CharacterName, session: requests.Session | None = None) -> Character:
+    def get_frame_data(
+        self, character: CharacterName, session: requests.Session | None = None, previous: Character | None = None
+    ) -> Character:
         # TODO: duplicated across wavu and json_directory -> refactor
         target_char_meta = None
         for char_meta in self.character_meta:
@@ -53,7 +55,9 @@ class JsonDirectory(FrameService):
                     notes=move["notes"],
                     image=move["image"],
                     video=move["video"],
-                    alias=move["alias"],
+                    alias=tuple(move["alias"]),
+                    alt=tuple(move.get("alt", ())),
+                    parent=move.get("parent", ""),
                 )
                 for move in move_file_contents
             }
@@ -1,11 +1,16 @@
+import json
 import os
+import pathlib
+import shutil
 
 import pytest
 
+import frame_service.wavu.utils as wavu_utils
 from frame_service import JsonDirectory
-from framedb import CharacterName
+from framedb import Character, CharacterName
 
 STATIC_BASE = os.path.join(os.path.dirname(__file__), "static")
+WAVU_STATIC_BASE = os.path.join(os.path.dirname(__file__), "..", "..", "wavu", "tests", "static")
 
 
 @pytest.fixture
@@ -19,3 +24,23 @@ def json_directory() -> JsonDirectory:
 def test_get_movelist_from_json(json_directory: JsonDirectory) -> None:
     char = json_directory.get_frame_data(CharacterName.AZUCENA, None)
     assert char is not None
+
+
+def test_get_movelist_from_json_move_tree(json_directory: JsonDirectory) -> None:
+    char = json_directory.get_frame_data(CharacterName.AZUCENA, None)
+    assert [move.id for move in char.get_children("Azucena-1")] == ["Azucena-1,1", "Azucena-1,2"]
+    root = char.get_root("Azucena-1,1")
+    assert root and root.id == "Azucena-1"
+
+
+def test_export_round_trip(tmp_path: pathlib.Path) -> None:
+    with open(os.path.join(WAVU_STATIC_BASE, "azucena.json"), "r") as f:
+        movelist = wavu_utils._get_wavu_character_movelist(json.load(f))
+    char = Character(CharacterName.AZUCENA, "portrait", movelist, "page")
+    char.export_movelist(str(tmp_path / "azucena.json"))
+    shutil.copy(os.path.join(STATIC_BASE, "character_list.json"), tmp_path)
+
+    exported_char = JsonDirectory(str(tmp_path / "character_list.json"), str(tmp_path)).get_frame_data(CharacterName.AZUCENA)
+    assert exported_char.move_tree == char.move_tree
+    assert exported_char.movelist.keys() == movelist.keys()
+    assert all(vars(exported_char.movelist[move_id]) == vars(move) for move_id, move in movelist.items())
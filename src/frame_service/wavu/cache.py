@@ -0,0 +1,83 @@
+"""
+An on-disk cache of raw responses from the Wavu API.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict
+
+from framedb import CharacterName
+from framedb.files import write_atomically
+
+logger = logging.getLogger("main")
+
+"How long a cached response is considered fresh by default, in seconds"
+DEFAULT_CACHE_TTL_SEC = 3600.0
+
+"The file in a cache directory that records when each response was fetched"
+MANIFEST_FILE = "manifest.json"
+
+
+class ResponseCache:
+    """
+    A directory of raw cargoquery responses, one <character>.json file per character, in the same format as the Wavu
+    test fixtures.
+
+    The time each response was fetched is recorded in a manifest next to them. A response is fresh for ttl seconds after
+    it was fetched, or forever if ttl is None. A response that is missing from the manifest is only ever fresh if ttl is
+    None, so a directory of fixtures can be used as a cache as is.
+    """
+
+    def __init__(self, cache_dir: str, ttl: float | None = DEFAULT_CACHE_TTL_SEC) -> None:
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        self._fetched_at: Dict[str, float] = {}
+        manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, "r") as f:
+                    self._fetched_at = {character: float(entry["fetched_at"]) for character, entry in json.load(f).items()}
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable response cache manifest {manifest_path}: {e}")
+
+    def _get_path(self, character: CharacterName) -> str:
+        return os.path.join(self.cache_dir, f"{character.value}.json")
+
+    def get_fetched_at(self, character: CharacterName) -> float | None:
+        "Get when the cached response for a character was fetched, as a Unix timestamp, if it's known"
+
+        return self._fetched_at.get(character.value)
+
+    def is_fresh(self, character: CharacterName) -> bool:
+        "Check if there is a fresh cached response for a character"
+
+        fetched_at = self.get_fetched_at(character)
+        if self.ttl is not None and (fetched_at is None or time.time() - fetched_at > self.ttl):
+            return False
+        return os.path.exists(self._get_path(character))
+
+    def get(self, character: CharacterName) -> bytes | None:
+        "Get the cached response for a character, or None if there isn't a fresh one"
+
+        if not self.is_fresh(character):
+            return None
+        try:
+            with open(self._get_path(character), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, character: CharacterName, content: bytes, fetched_at: float | None = None) -> None:
+        "Cache the response for a character, fetched at a Unix timestamp or now"
+
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_atomically(self._get_path(character), content)
+            self._fetched_at[character.value] = time.time() if fetched_at is None else fetched_at
+            manifest = {character: {"fetched_at": fetched_at} for character, fetched_at in sorted(self._fetched_at.items())}
+            write_atomically(os.path.join(self.cache_dir, MANIFEST_FILE), json.dumps(manifest, indent=4).encode())
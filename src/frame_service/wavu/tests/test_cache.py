@@ -0,0 +1,39 @@
+import os
+import pathlib
+import shutil
+
+from frame_service.wavu.cache import MANIFEST_FILE, ResponseCache
+from framedb import CharacterName
+
+STATIC_BASE = os.path.join(os.path.dirname(__file__), "static")
+
+
+def test_response_cache_round_trip(tmp_path: pathlib.Path) -> None:
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    assert cache.get(CharacterName.AZUCENA) is None
+    cache.put(CharacterName.AZUCENA, b'{"cargoquery": []}')
+    assert cache.get(CharacterName.AZUCENA) == b'{"cargoquery": []}'
+    assert (tmp_path / MANIFEST_FILE).exists()
+    assert not [path for path in tmp_path.iterdir() if path.name.endswith(".tmp")]
+
+    # the manifest is read back by a new cache over the same directory
+    assert ResponseCache(str(tmp_path), ttl=60).get(CharacterName.AZUCENA) == b'{"cargoquery": []}'
+
+
+def test_response_cache_expires(tmp_path: pathlib.Path) -> None:
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    cache.put(CharacterName.AZUCENA, b"{}", fetched_at=0.0)
+    assert cache.get(CharacterName.AZUCENA) is None
+    assert ResponseCache(str(tmp_path), ttl=None).get(CharacterName.AZUCENA) == b"{}"
+
+
+def test_response_cache_over_fixtures(tmp_path: pathlib.Path) -> None:
+    shutil.copy(os.path.join(STATIC_BASE, "azucena.json"), tmp_path)
+    assert ResponseCache(str(tmp_path), ttl=60).get(CharacterName.AZUCENA) is None  # unknown age
+    with open(os.path.join(STATIC_BASE, "azucena.json"), "rb") as f:
+        assert ResponseCache(str(tmp_path), ttl=None).get(CharacterName.AZUCENA) == f.read()
+
+
+def test_response_cache_ignores_corrupt_manifest(tmp_path: pathlib.Path) -> None:
+    (tmp_path / MANIFEST_FILE).write_text("{")
+    assert ResponseCache(str(tmp_path)).get(CharacterName.AZUCENA) is None
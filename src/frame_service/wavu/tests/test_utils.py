@@ -1,8 +1,13 @@
+import glob
+import html
 import json
 import os
-from typing import Any
+import random
+import re
+from typing import Any, Dict, List
 
 import pytest
+from bs4 import BeautifulSoup
 
 import frame_service.wavu.utils as utils
 from frame_service.wavu.tests.test_wavu import STATIC_BASE
@@ -15,11 +20,6 @@ def wavu_response(request: Any) -> Any:
         return request.param, json.load(f)
 
 
-@pytest.mark.skip(reason="Not implemented")
-def test_get_wavu_response() -> None:
-    pass
-
-
 class TestGetWavuCharacterMovelist:
     @pytest.mark.parametrize("wavu_response", [CharacterName.AZUCENA], indirect=True)
     def test_get_wavu_character_movelist(self, wavu_response: Any) -> None:
@@ -65,6 +65,16 @@ class TestGetWavuCharacterMovelist:
         assert movelist["Jin-1,2,3"].name == "Left Right > Axe Kick"
 
 
+@pytest.mark.parametrize("wavu_response", [CharacterName.AZUCENA], indirect=True)
+def test_get_wavu_character_movelist_field_stats(wavu_response: Any) -> None:
+    char_name, response = wavu_response
+    stats: Dict[str, utils.FieldTransformStats] = {}
+    movelist = utils._get_wavu_character_movelist(response, stats=stats)
+    assert movelist == utils._get_wavu_character_movelist(response)
+    assert stats.keys() == utils.FIELD_TRANSFORMS.keys()
+    assert all(field_stats.calls == len(movelist) and field_stats.duration > 0 for field_stats in stats.values())
+
+
 @pytest.mark.skip(reason="Not implemented")
 def test_convert_json_move() -> None:
     pass
@@ -85,14 +95,79 @@ def test_normalize_data() -> None:
     pass
 
 
+def test_split_rows_by_character() -> None:
+    ids = ["Devil Jin-1", "devil jin-2", "Devil_Jin-3", "Jin-1", "Jack-8-1", "Jun-1", None]
+    rows = [{"title": {"id": id}} for id in ids]
+    split = utils._split_rows_by_character(rows, [CharacterName.DEVIL_JIN, CharacterName.JIN, CharacterName.EDDY])
+    assert {
+        character: [row["title"]["id"] for row in json.loads(content)["cargoquery"]] for character, content in split.items()
+    } == {
+        CharacterName.DEVIL_JIN: ["Devil Jin-1", "devil jin-2", "Devil_Jin-3"],
+        CharacterName.JIN: ["Jin-1"],
+        CharacterName.EDDY: [],
+    }
+
+
+def test_check_page(caplog: pytest.LogCaptureFixture) -> None:
+    utils._check_page([{}] * 499, 500, "the movelist of azucena")
+    assert not caplog.records
+    utils._check_page([{}] * 500, 500, "the movelist of azucena")
+    assert "truncated" in caplog.text
+
+
 def test_create_aliases() -> None:
     assert utils._create_aliases("f+2+4,1") == ("f+2+4,1", ())
     assert utils._create_aliases("f+1+3_f+2+4") == ("f+1+3", ("f+2+4",))
 
 
-@pytest.mark.skip(reason="Not implemented")
+def _remove_html_tags_reference(data: str) -> str:
+    "The original implementation of _remove_html_tags, which parses every field with BeautifulSoup"
+
+    result = html.unescape(utils._normalize_data(data))
+    result = BeautifulSoup(result, features="lxml").get_text()
+    result = result.replace("* \n", "* ")
+    result = re.sub(r"(\n)+", "\n", result)
+    result = result.replace("'''", "")
+    result = result.replace("**", " *")  # hack/fix for nested Plainlists
+    result = result.strip()
+    return result
+
+
+def _html_fields(move_json: Any) -> List[str]:
+    "The fields of a move that are stripped of HTML tags, as they are passed to _remove_html_tags"
+
+    return [
+        utils._normalize_data(move_json["block"]),
+        utils._normalize_data(utils._process_links(move_json["hit"])),
+        utils._normalize_data(utils._process_links(move_json["ch"])),
+        utils._normalize_data(move_json.get("alias")),
+        utils._normalize_data(move_json.get("alt")),
+        utils._process_links(move_json["notes"]),
+    ]
+
+
 def test_remove_html_tags() -> None:
-    pass
+    assert utils._remove_html_tags("-12") == "-12"
+    assert utils._remove_html_tags("&lt;div class=&quot;plainlist&quot;&gt;\n* h\n* m\n&lt;/div&gt;") == "* h\n* m"
+    assert utils._remove_html_tags("&lt;!-- hidden --&gt;+4") == "+4"
+
+
+def test_remove_html_tags_matches_reference_on_fixtures() -> None:
+    for path in glob.glob(os.path.join(STATIC_BASE, "*.json")):
+        with open(path, "r") as f:
+            for row in json.load(f)["cargoquery"]:
+                for data in _html_fields(row["title"]):
+                    assert utils._remove_html_tags(data) == _remove_html_tags_reference(data)
+
+
+def test_remove_html_tags_matches_reference_on_random_markup() -> None:
+    rng = random.Random(2405)
+    tokens = [" ", "\n", "\t", "\r", "\x00", "\x0b", "a", "1", "*", "* \n", "'", "<", ">", "&amp;", "&lt;", "&quot;"]
+    tokens += ["<div>", "</div>", '<div\n class="plainlist">', "<div title='a>b'>", "<span>", "</span>", "<br>", "<br/>"]
+    tokens += ["<sup>", "</sup>", "<b>", "</b>", "<i>", "</i>", "<p>", "<!-- c -->"]
+    for _ in range(5000):
+        data = "".join(rng.choice(tokens) for _ in range(rng.randint(0, 12)))
+        assert utils._remove_html_tags(data) == _remove_html_tags_reference(data), repr(data)
 
 
 def test_process_links() -> None:
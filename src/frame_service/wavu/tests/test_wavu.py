@@ -1,13 +1,95 @@
+import asyncio
+import glob
+import json
 import os
+import pathlib
+import re
+from typing import Any, Dict, List, Mapping, Tuple
 
+import aiohttp
+import aiohttp.test_utils
+import aiohttp.web
 import requests
 
+import frame_service.wavu.utils as utils
 from frame_service import Wavu
-from framedb import CharacterName
+from frame_service.wavu.cache import ResponseCache
+from framedb import Character, CharacterName, FrameDb
 from framedb.const import NUM_CHARACTERS
 
 STATIC_BASE = os.path.join(os.path.dirname(__file__), "static")
 
+"The most rows the stub Wavu API returns per page, less than is requested, like a wiki that caps the limit"
+STUB_PAGE_SIZE = 1000
+
+
+def _stub_wavu_app(changes: List[Dict[str, Any]] | None = None, requested: List[str] | None = None) -> aiohttp.web.Application:
+    """
+    A stub of the Wavu API that answers cargoqueries from the test fixtures, and recent changes queries with a list of
+    changes, one per page. Without a list of changes, recent changes queries fail. Cargoqueries without a where clause
+    page through all fixtures, at most STUB_PAGE_SIZE rows at a time.
+    """
+
+    async def api(request: aiohttp.web.Request) -> aiohttp.web.Response:
+        if request.query["action"] == "query":
+            if changes is None:
+                return aiohttp.web.json_response({"error": {"code": "unknown_list"}})
+            offset = int(request.query.get("rccontinue", 0))
+            content: Dict[str, Any] = {"query": {"recentchanges": changes[offset : offset + 1]}}
+            if offset + 1 < len(changes):
+                content["continue"] = {"rccontinue": str(offset + 1), "continue": "-||"}
+            return aiohttp.web.json_response(content)
+
+        if "where" not in request.query:
+            if requested is not None:
+                requested.append("*")
+            offset, limit = int(request.query["offset"]), min(int(request.query["limit"]), STUB_PAGE_SIZE)
+            return aiohttp.web.json_response({"cargoquery": _all_fixture_rows()[offset : offset + limit]})
+
+        match = re.fullmatch(r"id LIKE '(?P<name>.+)%'", request.query["where"])
+        assert match is not None
+        name = match.group("name").lower()
+        if requested is not None:
+            requested.append(name)
+        path = os.path.join(STATIC_BASE, f"{name}.json")
+        if not os.path.exists(path):
+            return aiohttp.web.json_response({"cargoquery": []})
+        with open(path, "r") as f:
+            return aiohttp.web.Response(text=f.read(), content_type="application/json")
+
+    app = aiohttp.web.Application()
+    app.router.add_get("/w/api.php", api)
+    return app
+
+
+def _all_fixture_rows() -> List[Any]:
+    "All rows of the Move table in the test fixtures, ordered by id"
+
+    rows = []
+    for path in sorted(glob.glob(os.path.join(STATIC_BASE, "*.json"))):
+        with open(path, "r") as f:
+            rows.extend(json.load(f)["cargoquery"])
+    return sorted(rows, key=lambda row: row["title"]["id"])
+
+
+def _reload_async(changes: List[Dict[str, Any]] | None) -> Tuple[FrameDb, Mapping[CharacterName, Character], List[str]]:
+    "Load the frame data from the stub Wavu API twice, returning the frame data of the first load and what the second requested"
+
+    requested: List[str] = []
+
+    async def reload() -> Tuple[FrameDb, Mapping[CharacterName, Character]]:
+        async with aiohttp.test_utils.TestServer(_stub_wavu_app(changes, requested)) as server:
+            wavu = Wavu(api_url=str(server.make_url("/w/api.php")))
+            framedb = FrameDb()
+            await framedb.load_async(wavu, max_concurrency=4)
+            frames = framedb.frames
+            requested.clear()
+            await framedb.load_async(wavu, max_concurrency=4)
+            return framedb, frames
+
+    framedb, frames = asyncio.run(reload())
+    return framedb, frames, requested
+
 
 def test_wavu_creation() -> None:
     wavu = Wavu()
@@ -23,6 +105,123 @@ def test_get_frame_data() -> None:
     assert char.portrait == "https://wavu.wiki/w/images/6/65/AzucenaT8.png"
 
 
+def test_get_frame_data_async() -> None:
+    async def get_frame_data() -> Character:
+        async with aiohttp.test_utils.TestServer(_stub_wavu_app()) as server:
+            wavu = Wavu(api_url=str(server.make_url("/w/api.php")))
+            async with aiohttp.ClientSession() as session:
+                return await wavu.get_frame_data_async(CharacterName.AZUCENA, session)
+
+    char = asyncio.run(get_frame_data())
+    assert char.name == CharacterName.AZUCENA
+    assert char.portrait == "https://wavu.wiki/w/images/6/65/AzucenaT8.png"
+    with open(os.path.join(STATIC_BASE, "azucena.json"), "r") as f:
+        assert char.movelist == utils._get_wavu_character_movelist(json.load(f))
+
+
+def test_framedb_load_async() -> None:
+    async def load() -> FrameDb:
+        async with aiohttp.test_utils.TestServer(_stub_wavu_app()) as server:
+            framedb = FrameDb()
+            await framedb.load_async(Wavu(api_url=str(server.make_url("/w/api.php"))), max_concurrency=4)
+            return framedb
+
+    framedb = asyncio.run(load())
+    assert len(framedb.frames) == NUM_CHARACTERS
+    move = framedb.get_move_by_input(CharacterName.AZUCENA, "df+1")
+    assert move and move.id == "Azucena-df+1"
+
+
+def test_framedb_reload_async_skips_unchanged_characters() -> None:
+    framedb, old_frames, requested = _reload_async(None)
+    assert framedb.generation == 2
+    assert len(requested) == NUM_CHARACTERS  # no change feed, so everything is retrieved again
+    assert all(framedb.frames[character] is frames for character, frames in old_frames.items())
+    assert framedb.frames[CharacterName.AZUCENA].source_digest
+
+
+def test_framedb_reload_async_retrieves_changed_characters() -> None:
+    changes = [
+        {"ns": 0, "title": "Azucena movelist"},
+        {"ns": 0, "title": "Main Page"},
+        {"ns": 0, "title": "Devil Jin movelist"},
+        {"ns": 0, "title": "Azucena movelist"},
+    ]
+    framedb, old_frames, requested = _reload_async(changes)
+    assert sorted(requested) == ["azucena", "devil_jin"]
+    assert framedb.generation == 2 and framedb.frames == old_frames
+
+
+def test_framedb_reload_async_retrieves_everything_on_template_change() -> None:
+    _, _, requested = _reload_async([{"ns": 10, "title": "Template:Move"}])
+    assert len(requested) == NUM_CHARACTERS
+
+
+def test_framedb_load_async_from_cache(tmp_path: pathlib.Path) -> None:
+    requested: List[str] = []
+
+    async def load() -> List[List[str]]:
+        requests_per_load = []
+        async with aiohttp.test_utils.TestServer(_stub_wavu_app([], requested)) as server:
+            api_url = str(server.make_url("/w/api.php"))
+            await FrameDb().load_async(Wavu(api_url=api_url, cache=ResponseCache(str(tmp_path))), max_concurrency=4)
+
+            # a restart within the TTL loads from the cache, and the next refresh fetches what came from the cache
+            framedb = FrameDb()
+            wavu = Wavu(api_url=api_url, cache=ResponseCache(str(tmp_path)))
+            for _ in range(3):
+                requested.clear()
+                await framedb.load_async(wavu, max_concurrency=4)
+                requests_per_load.append(list(requested))
+            return requests_per_load
+
+    cold_start, first_refresh, second_refresh = asyncio.run(load())
+    assert cold_start == []
+    assert len(first_refresh) == NUM_CHARACTERS
+    assert second_refresh == []
+
+
+def test_get_frame_data_in_parse_pool() -> None:
+    # the fixtures never expire, so the frame data is parsed without going to the network
+    serial_wavu = Wavu(cache=ResponseCache(STATIC_BASE, ttl=None))
+    pooled_wavu = Wavu(cache=ResponseCache(STATIC_BASE, ttl=None), parse_workers=2)
+    try:
+        for character in [CharacterName.AZUCENA, CharacterName.DEVIL_JIN, CharacterName.KUMA]:
+            char = pooled_wavu.get_frame_data(character)
+            assert char == serial_wavu.get_frame_data(character)
+    finally:
+        pooled_wavu.close()
+
+
+def test_framedb_load_async_in_parse_pool() -> None:
+    async def load(parse_workers: int) -> FrameDb:
+        async with aiohttp.test_utils.TestServer(_stub_wavu_app()) as server:
+            wavu = Wavu(api_url=str(server.make_url("/w/api.php")), parse_workers=parse_workers)
+            framedb = FrameDb()
+            try:
+                await framedb.load_async(wavu, max_concurrency=4)
+            finally:
+                wavu.close()
+            return framedb
+
+    assert asyncio.run(load(2)).frames == asyncio.run(load(0)).frames
+
+
+def test_framedb_load_async_in_bulk() -> None:
+    requested: List[str] = []
+
+    async def load(bulk_fetch: bool) -> FrameDb:
+        async with aiohttp.test_utils.TestServer(_stub_wavu_app(None, requested)) as server:
+            framedb = FrameDb()
+            wavu = Wavu(api_url=str(server.make_url("/w/api.php")), bulk_fetch=bulk_fetch)
+            await framedb.load_async(wavu, max_concurrency=4)
+            return framedb
+
+    framedb = asyncio.run(load(True))
+    assert requested == ["*"] * (len(_all_fixture_rows()) // STUB_PAGE_SIZE + 2)  # every page, then an empty one
+    assert framedb.frames == asyncio.run(load(False)).frames
+
+
 def test_all_char_meta() -> None:
     wavu = Wavu()
     assert len(wavu.character_meta) == NUM_CHARACTERS
@@ -1,19 +1,39 @@
+import asyncio
+import datetime
+import hashlib
 import html
 import json
+import logging
 import os
 import re
+import time
 from dataclasses import dataclass
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Tuple
 
+import aiohttp
 import requests
 from bs4 import BeautifulSoup
 
 from framedb.character import Move
 from framedb.const import CharacterName
 
+logger = logging.getLogger("main")
+
 WAVU_API_URL = "https://wavu.wiki/w/api.php"
 WAVU_FILE_LINK = "https://wavu.wiki/t/Special:Redirect/file/"
 
+"How many rows a single cargoquery returns at most"
+CARGO_QUERY_LIMIT = 500
+
+"How many rows of the Move table to request per page when fetching it in bulk. Wavu may cap it further."
+BULK_PAGE_SIZE = 5000
+
+"The MediaWiki namespace that movelist pages are in"
+MAIN_NAMESPACE = 0
+
+"The MediaWiki namespace of templates, which can change the moves stored by every movelist page"
+TEMPLATE_NAMESPACE = 10
+
 """Available fields for the Move table in the Wavu DB"""
 FIELDS = [
     "id",
@@ -40,42 +60,249 @@ FIELDS = [
 
 @dataclass
 class WavuMove(Move):
-    parent: str = ""
+    "A move as converted from a Wavu API response, before the input, target and damage of its parents are prepended"
+
+
+@dataclass
+class FieldTransformStats:
+    "Cumulative statistics for the transform of a field of the Move table"
+
+    calls: int = 0
+    duration: float = 0.0
+
+
+def _get_character_id_pattern(character_name: CharacterName) -> str:
+    "Get the SQL LIKE pattern that the ids of a character's moves match"
+
+    return f"{character_name.value.title()}%"
+
+
+def _compile_like_pattern(pattern: str) -> re.Pattern[str]:
+    """
+    Compile a SQL LIKE pattern into an equivalent regex
+
+    `%` matches any number of characters and `_` any single character. Matching is case-insensitive, like the default
+    collations of the databases behind Cargo.
+    """
+
+    regex = "".join(".*" if char == "%" else "." if char == "_" else re.escape(char) for char in pattern)
+    return re.compile(regex, re.IGNORECASE | re.DOTALL)
 
 
-def _get_wavu_response(session: requests.Session, character_name: CharacterName, format: str = "json") -> Any:
+def _get_wavu_query_params(character_name: CharacterName, format: str = "json") -> Dict[str, str]:
     """
-    Get the movelist for a character from the Wavu API
+    Get the cargoquery parameters for the movelist of a character
     """
 
-    params = {
+    return {
         "action": "cargoquery",
         "tables": "Move",
         "fields": ",".join(FIELDS),
-        "where": f"id LIKE '{character_name.value.title()}%'",
+        "where": f"id LIKE '{_get_character_id_pattern(character_name)}'",
         "having": "",
         "order_by": "id",
-        "limit": "500",  # TODO: could probably limit this further?
+        "limit": str(CARGO_QUERY_LIMIT),
+        "format": format,
+    }
+
+
+def _get_wavu_bulk_query_params(offset: int, format: str = "json") -> Dict[str, str]:
+    """
+    Get the cargoquery parameters for a page of the whole Move table, starting at an offset
+    """
+
+    return {
+        "action": "cargoquery",
+        "tables": "Move",
+        "fields": ",".join(FIELDS),
+        "having": "",
+        "order_by": "id,_ID",  # the row ID breaks ties between duplicate ids, so that pages don't overlap
+        "limit": str(BULK_PAGE_SIZE),
+        "offset": str(offset),
         "format": format,
     }
 
-    response = session.get(WAVU_API_URL, params=params)  # TODO: use MediaWiki library to handle
-    content = json.loads(response.content)
-    return content
+
+def _check_page(rows: List[Any], limit: int, description: str) -> None:
+    "Warn if a page of rows from a cargoquery came back full, in which case there may be more rows than were returned"
+
+    if len(rows) >= limit:
+        logger.warning(f"Cargoquery for {description} returned a full page of {len(rows)} rows, it may be truncated")
+
+
+def _get_wavu_response_content(
+    session: requests.Session, character_name: CharacterName, format: str = "json", api_url: str = WAVU_API_URL
+) -> bytes:
+    """
+    Get the raw movelist response for a character from the Wavu API
+    """
+
+    params = _get_wavu_query_params(character_name, format)
+    response = session.get(api_url, params=params)  # TODO: use MediaWiki library to handle
+    response.raise_for_status()
+    return response.content
+
+
+async def _get_wavu_response_content_async(
+    session: aiohttp.ClientSession, character_name: CharacterName, format: str = "json", api_url: str = WAVU_API_URL
+) -> bytes:
+    """
+    Get the raw movelist response for a character from the Wavu API asynchronously
+    """
+
+    params = _get_wavu_query_params(character_name, format)
+    async with session.get(api_url, params=params, raise_for_status=True) as response:
+        return await response.read()
+
+
+def _get_wavu_bulk_rows(session: requests.Session, format: str = "json", api_url: str = WAVU_API_URL) -> List[Any]:
+    """
+    Get every row of the Move table from the Wavu API, following offsets page by page until a page comes back empty
+
+    Stopping only at an empty page rather than a short one makes the result complete even if Wavu caps the page size.
+    """
+
+    rows: List[Any] = []
+    while True:
+        response = session.get(api_url, params=_get_wavu_bulk_query_params(len(rows), format))
+        response.raise_for_status()
+        page = _get_bulk_page(response.json())
+        if not page:
+            return rows
+        rows.extend(page)
+
+
+async def _get_wavu_bulk_rows_async(
+    session: aiohttp.ClientSession, format: str = "json", api_url: str = WAVU_API_URL
+) -> List[Any]:
+    """
+    Get every row of the Move table from the Wavu API asynchronously, like _get_wavu_bulk_rows
+    """
+
+    loop = asyncio.get_running_loop()
+    rows: List[Any] = []
+    while True:
+        async with session.get(
+            api_url, params=_get_wavu_bulk_query_params(len(rows), format), raise_for_status=True
+        ) as response:
+            content = await response.read()
+        # a page of the whole Move table is the largest document the bot decodes, so keep it off the event loop
+        page = _get_bulk_page(await loop.run_in_executor(None, json.loads, content))
+        if not page:
+            return rows
+        rows.extend(page)
+
+
+def _get_bulk_page(content: Any) -> List[Any]:
+    "Get the rows in a page of the Move table from the Wavu API"
+
+    if "error" in content:
+        raise Exception(f"Could not get the Move table from Wavu: {content['error']}")
+    rows: List[Any] = content["cargoquery"]
+    return rows
+
+
+def _split_rows_by_character(rows: List[Any], characters: Iterable[CharacterName]) -> Dict[CharacterName, bytes]:
+    """
+    Split rows of the Move table into the response each character's own cargoquery would have gotten
+
+    A row goes to every character whose id pattern it matches, just like it would be returned by each of their queries.
+    """
+
+    patterns = {character: _compile_like_pattern(_get_character_id_pattern(character)) for character in characters}
+    character_rows: Dict[CharacterName, List[Any]] = {character: [] for character in patterns}
+    for row in rows:
+        id = row["title"].get("id") or ""
+        for character, pattern in patterns.items():
+            if pattern.fullmatch(id):
+                character_rows[character].append(row)
+    return {character: json.dumps({"cargoquery": rows}).encode() for character, rows in character_rows.items()}
+
+
+def _get_response_digest(content: bytes) -> str:
+    "Get a digest of a raw Wavu API response, to tell whether a movelist has changed"
+
+    return hashlib.sha256(content).hexdigest()
+
+
+def _get_recent_changes_params(since: datetime.datetime) -> Dict[str, str]:
+    """
+    Get the query parameters for the recent changes to movelist pages and templates since a point in time
+    """
+
+    return {
+        "action": "query",
+        "list": "recentchanges",
+        "rcstart": since.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "rcdir": "newer",
+        "rcnamespace": f"{MAIN_NAMESPACE}|{TEMPLATE_NAMESPACE}",
+        "rcprop": "title",
+        "rclimit": "max",
+        "format": "json",
+        "continue": "",
+    }
+
+
+def _get_recent_changes_page(content: Any) -> Tuple[List[Dict[str, Any]], Dict[str, str] | None]:
+    """
+    Get the changes in a page of recent changes from the Wavu API, and the parameters to continue from if there are more
+    """
+
+    if "error" in content:
+        raise Exception(f"Could not get recent changes from Wavu: {content['error']}")
+    return content["query"]["recentchanges"], content.get("continue")
+
+
+def _get_recent_changes(
+    session: requests.Session, since: datetime.datetime, api_url: str = WAVU_API_URL
+) -> List[Dict[str, Any]]:
+    """
+    Get the recent changes to movelist pages and templates on Wavu since a point in time
+    """
+
+    params = _get_recent_changes_params(since)
+    changes: List[Dict[str, Any]] = []
+    while True:
+        response = session.get(api_url, params=params)
+        response.raise_for_status()
+        page, next_params = _get_recent_changes_page(response.json())
+        changes.extend(page)
+        if next_params is None:
+            return changes
+        params.update(next_params)
+
+
+async def _get_recent_changes_async(
+    session: aiohttp.ClientSession, since: datetime.datetime, api_url: str = WAVU_API_URL
+) -> List[Dict[str, Any]]:
+    """
+    Get the recent changes to movelist pages and templates on Wavu since a point in time asynchronously
+    """
+
+    params = _get_recent_changes_params(since)
+    changes: List[Dict[str, Any]] = []
+    while True:
+        async with session.get(api_url, params=params, raise_for_status=True) as response:
+            page, next_params = _get_recent_changes_page(await response.json())
+        changes.extend(page)
+        if next_params is None:
+            return changes
+        params.update(next_params)
 
 
 def _get_wavu_character_movelist(
-    content: Any,
-    format: str = "json",
+    content: Any, format: str = "json", stats: Dict[str, FieldTransformStats] | None = None
 ) -> Dict[str, Move]:
     """
     Get the movelist for a character from a Wavu API response
+
+    If stats are given, the time spent transforming each field is added to them.
     """
 
     match format:
         case "json":
             movelist_raw = content["cargoquery"]
-            movelist = _convert_wavu_movelist(_convert_json_movelist(movelist_raw))
+            movelist = _convert_wavu_movelist(_convert_json_movelist(movelist_raw, stats))
         case _:
             raise NotImplementedError(f"Format {format} not implemented")
     return movelist
@@ -87,65 +314,25 @@ def _process_dotlist(dotlist: str) -> List[str]:
     return dotlist.replace("* ", "").split("\n")
 
 
-def _convert_json_move(move_json: Any) -> WavuMove:
+def _convert_json_move(move_json: Any, stats: Dict[str, FieldTransformStats] | None = None) -> WavuMove:
     """
     Convert a JSON response object into a WavuMove object
     Process each field to ensure it is in the correct format
-    """
-
-    id = _normalize_data(move_json["id"])
-    parent = _normalize_data(move_json["parent"])
-
-    name = html.unescape(_process_links(move_json["name"]))
-
-    input = html.unescape(html.unescape(_normalize_data(move_json["input"])))
 
-    target = _normalize_data(move_json["target"])
-
-    damage = _normalize_data(move_json["damage"])
-
-    on_block = _remove_html_tags(_normalize_data(move_json["block"]))
+    If stats are given, the time spent transforming each field is added to them.
+    """
 
-    on_hit = _remove_html_tags(_normalize_data(_process_links(move_json["hit"])))
+    fields = _transform_fields(move_json, stats)
 
-    on_ch = _remove_html_tags(_normalize_data(_process_links(move_json["ch"])))
+    on_ch = fields["ch"]
     if not on_ch or on_ch == "":
-        on_ch = on_hit
-
-    startup = _normalize_data(move_json["startup"])
-
-    recovery = _normalize_data(move_json["recv"])
-
-    if "alias" in move_json:
-        tmp_alias = _process_dotlist(_remove_html_tags(_normalize_data(move_json["alias"])))
-        alias = tuple(x for x in tmp_alias if x != "")
-    else:
-        alias = ()
-
-    if "alt" in move_json:
-        tmp_alt = _process_dotlist(_remove_html_tags(_normalize_data(move_json["alt"])))
-        alt = tuple(x for x in tmp_alt if x != "")
-    else:
-        alt = ()
-
-    if "image" in move_json and move_json["image"]:
-        image = _process_links(move_json["image"])
-        image_name = image.split(":")[-1]
-        image_name = image_name.replace(" ", "_")
-        image = WAVU_FILE_LINK + image_name
-    else:
-        image = ""
+        on_ch = fields["hit"]
 
-    if "video" in move_json and move_json["video"]:
-        video = _process_links(move_json["video"])
-        video_name = video.split(":")[-1]
-        video_name = video_name.replace(" ", "_")
-        video = WAVU_FILE_LINK + video_name
-    else:
-        video = ""
+    alias = tuple(x for x in _process_dotlist(fields["alias"]) if x != "")
+    alt = tuple(x for x in _process_dotlist(fields["alt"]) if x != "")
 
-    notes = _remove_html_tags(_process_links(move_json["notes"])).strip()
-    crush = _normalize_data(move_json["crush"])
+    notes = fields["notes"]
+    crush = fields["crush"]
     if "pc" in crush:
         notes += "\n* Power Crush"
     if "js" in crush:
@@ -154,27 +341,43 @@ def _convert_json_move(move_json: Any) -> WavuMove:
         notes += "\n" + crush
 
     move = WavuMove(
-        id,
-        input,
-        name,
-        target,
-        damage,
-        on_block,
-        on_hit,
+        fields["id"],
+        fields["input"],
+        fields["name"],
+        fields["target"],
+        fields["damage"],
+        fields["block"],
+        fields["hit"],
         on_ch,
-        startup,
-        recovery,
+        fields["startup"],
+        fields["recv"],
         notes,
-        image,
-        video,
+        fields["image"],
+        fields["video"],
         alias,
         alt,
-        parent,
+        fields["parent"],
     )
     return move
 
 
-def _convert_json_movelist(movelist_json: List[Any]) -> List[WavuMove]:
+def _transform_fields(move_json: Any, stats: Dict[str, FieldTransformStats] | None = None) -> Dict[str, str]:
+    "Pass each field of a JSON response object through its transform, timing them if stats are given"
+
+    if stats is None:
+        return {field: transform(_empty_value_if_none(move_json.get(field))) for field, transform in FIELD_TRANSFORMS.items()}
+
+    fields = {}
+    for field, transform in FIELD_TRANSFORMS.items():
+        start = time.perf_counter()
+        fields[field] = transform(_empty_value_if_none(move_json.get(field)))
+        field_stats = stats.setdefault(field, FieldTransformStats())
+        field_stats.calls += 1
+        field_stats.duration += time.perf_counter() - start
+    return fields
+
+
+def _convert_json_movelist(movelist_json: List[Any], stats: Dict[str, FieldTransformStats] | None = None) -> List[WavuMove]:
     """
     Convert a list of JSON response objects into a list of WavuMove objects
     Process each field to ensure it is in the correct format
@@ -182,7 +385,7 @@ def _convert_json_movelist(movelist_json: List[Any]) -> List[WavuMove]:
 
     movelist = [move["title"] for move in movelist_json]  # Wavu response nests moves under 'title' field
     movelist = [move for move in movelist if move["ns"] == "0"]  # TODO: not sure why we need this
-    movelist = [_convert_json_move(move) for move in movelist]
+    movelist = [_convert_json_move(move, stats) for move in movelist]
     return movelist
 
 
@@ -250,10 +453,13 @@ def _empty_value_if_none(value: str | None) -> str:
     return value if value else ""
 
 
+NON_ASCII_PATTERN = re.compile(r"[^\x00-\x7F]+")
+
+
 def _normalize_data(data: str | None) -> str:
     if data:
         # remove non-ascii stuff
-        return re.sub(r"[^\x00-\x7F]+", "", data)
+        return NON_ASCII_PATTERN.sub("", data)
     else:
         return ""
 
@@ -273,13 +479,45 @@ def _create_aliases(input: str) -> Tuple[str, Tuple[str, ...]]:
     return input, tuple(aliases)
 
 
+"""
+The simple tags that Wavu wraps field values in, mostly for plain lists. Whole tags, attributes included, can be cut
+out of the text without changing what BeautifulSoup would extract from it.
+"""
+SIMPLE_TAG_PATTERN = re.compile(r"""</?(?:div|span|sup|sub|small|b|i|br)(?:\s(?:[^<>"']|"[^"]*"|'[^']*')*)?/?>""")
+
+"Whitespace between two tags, which lxml may or may not drop depending on the tags around it"
+BLANK_BETWEEN_TAGS_PATTERN = re.compile(r">\s+<")
+
+"Characters that lxml doesn't keep as they are in text: markup, entities and control characters"
+PARSED_CHARS_PATTERN = re.compile(r"[<&\x00-\x08\x0b-\x1f\x7f]")
+
+
+def _get_html_text(data: str) -> str:
+    """
+    Get the text content of an unescaped HTML fragment for _remove_html_tags.
+
+    Text without markup is returned as is and simple tags are cut out, so that a document is only parsed for markup that
+    needs it, e.g., comments, nested blocks or a stray `<` or `&`. Unlike BeautifulSoup with lxml, this keeps whitespace
+    at the start and end of the text, so the result only matches BeautifulSoup's once _remove_html_tags strips it.
+    """
+
+    if BLANK_BETWEEN_TAGS_PATTERN.search(data) is None:
+        text = SIMPLE_TAG_PATTERN.sub("", data) if "<" in data else data
+        if PARSED_CHARS_PATTERN.search(text) is None:
+            return text
+    return BeautifulSoup(data, features="lxml").get_text()
+
+
+NEWLINES_PATTERN = re.compile(r"(\n)+")
+
+
 def _remove_html_tags(data: str) -> str:
     "Process HTML content in JSON response to remove tags and unescape characters"
 
     result = html.unescape(_normalize_data(data))
-    result = BeautifulSoup(result, features="lxml").get_text()
+    result = _get_html_text(result)
     result = result.replace("* \n", "* ")
-    result = re.sub(r"(\n)+", "\n", result)
+    result = NEWLINES_PATTERN.sub("\n", result)
     result = result.replace("'''", "")
     result = result.replace("**", " *")  # hack/fix for nested Plainlists
     result = result.strip()
@@ -314,12 +552,56 @@ def _process_links(data: str | None) -> str:
     return link_replace_pattern.sub(_replace_link, _empty_value_if_none(data))
 
 
+def _get_file_link(data: str) -> str:
+    "Get the link to a file from a reference to it, e.g., File:Azucena df1.mp4"
+
+    return WAVU_FILE_LINK + data.split(":")[-1].replace(" ", "_") if data else ""
+
+
+def _compile_transform(steps: Tuple[Callable[[str], str], ...]) -> Callable[[str], str]:
+    "Compile the steps of a field transform into a single function"
+
+    def transform(data: str) -> str:
+        for step in steps:
+            data = step(data)
+        return data
+
+    return transform
+
+
+"""
+The steps each field of a move goes through, in order. _remove_html_tags normalizes and unescapes the data itself.
+Inputs are escaped twice in the Move table.
+"""
+FIELD_TRANSFORM_STEPS: Dict[str, Tuple[Callable[[str], str], ...]] = {
+    "id": (_normalize_data,),
+    "parent": (_normalize_data,),
+    "name": (_process_links, html.unescape),
+    "input": (_normalize_data, html.unescape, html.unescape),
+    "target": (_normalize_data,),
+    "damage": (_normalize_data,),
+    "block": (_remove_html_tags,),
+    "hit": (_process_links, _remove_html_tags),
+    "ch": (_process_links, _remove_html_tags),
+    "startup": (_normalize_data,),
+    "recv": (_normalize_data,),
+    "crush": (_normalize_data,),
+    "alias": (_remove_html_tags,),
+    "alt": (_remove_html_tags,),
+    "image": (_process_links, _get_file_link),
+    "video": (_process_links, _get_file_link),
+    "notes": (_process_links, _remove_html_tags),
+}
+
+FIELD_TRANSFORMS = {field: _compile_transform(steps) for field, steps in FIELD_TRANSFORM_STEPS.items()}
+
+
 if __name__ == "__main__":
     # Fetch cargo movelists for all chars for testing purposes
     with requests.session() as session:
         for char in CharacterName:
             print(f"Getting movelist for {char.value.title()}...")
-            response = _get_wavu_response(session, char)
+            response = json.loads(_get_wavu_response_content(session, char))
             movelist = _get_wavu_character_movelist(response)
             print(f"Got {len(movelist)} moves for {char.value.title()}")
             with open(os.path.join(os.path.dirname(__file__), "tests", "static", f"{char.value}.json"), "w") as f:
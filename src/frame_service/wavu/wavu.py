@@ -1,29 +1,207 @@
+import asyncio
+import datetime
 import json
+import logging
+import multiprocessing
 import os
+import threading
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Mapping, Set
 
+import aiohttp
 import requests
 
-from framedb import Character, CharacterName, FrameService, Move, Url
+from framedb import AsyncFrameService, Character, CharacterName, Move, Url
 
 from . import utils
+from .cache import ResponseCache
+
+logger = logging.getLogger("main")
 
 WAVU_CHARACTER_META_PATH = os.path.join(os.path.dirname(__file__), "static", "character_list.json")
 WAVU_LOGO = "https://wavu.wiki/android-chrome-192x192.png"
 
+"The fewest characters to fetch for which fetching the whole Move table in bulk beats a cargoquery per character"
+BULK_FETCH_MIN_CHARACTERS = 8
+
+"How far before the last retrieval to look for recent changes, to allow for clock skew between the bot and the wiki"
+RECENT_CHANGES_SLACK = datetime.timedelta(minutes=5)
+
+
+class Wavu(AsyncFrameService):
+    def __init__(
+        self,
+        _format: str = "json",
+        api_url: str = utils.WAVU_API_URL,
+        cache: ResponseCache | None = None,
+        parse_workers: int = 0,
+        bulk_fetch: bool = False,
+    ) -> None:
+        """
+        Responses are parsed by a pool of parse_workers processes, which is started on first use, or serially in the
+        calling thread if parse_workers is 0.
+
+        If bulk_fetch is set, the whole Move table is fetched in a few large pages when enough characters are loaded
+        at once, instead of with a cargoquery per character.
+        """
 
-class Wavu(FrameService):
-    def __init__(self, _format: str = "json") -> None:
         self.name = "Wavu Wiki"
         self.icon = WAVU_LOGO
         self._format = _format
+        self._api_url = api_url
+        self._cache = cache
+        self._parse_workers = parse_workers
+        self._parse_pool: ProcessPoolExecutor | None = None
+        self._parse_pool_lock = threading.Lock()
+        self._bulk_fetch = bulk_fetch
+
+        "Responses for the characters fetched in bulk by the last prefetch, each used once"
+        self._prefetched: Dict[CharacterName, bytes] = {}
+
+        "Characters whose frame data was last served from the cache, which may predate what the change feed covers"
+        self._served_from_cache: Set[CharacterName] = set()
 
         try:
             with open(WAVU_CHARACTER_META_PATH, "r") as f:
-                self.character_meta = json.load(f)
+                self.character_meta: List[Dict[str, str]] = json.load(f)
         except Exception as e:
             raise Exception(f"Could not load character meta data from {WAVU_CHARACTER_META_PATH}") from e
 
-    def get_frame_data(self, character: CharacterName, session: requests.Session | None = None) -> Character:
+        # movelist pages are titled after the character's page, e.g., https://wavu.wiki/t/Devil_Jin -> Devil Jin movelist
+        self._movelist_titles = {
+            f"{urllib.parse.unquote(char_meta['page'].rsplit('/', 1)[-1]).replace('_', ' ')} movelist": CharacterName(
+                char_meta["name"]
+            )
+            for char_meta in self.character_meta
+        }
+
+    def get_frame_data(
+        self, character: CharacterName, session: requests.Session | None = None, previous: Character | None = None
+    ) -> Character:
+        char_meta = self._get_character_meta(character)
+        content = self._get_cached_content(character, previous)
+        if content is not None:
+            return self._parse(char_meta, content, utils._get_response_digest(content))
+
+        content = self._prefetched.pop(character, None)
+        if content is None:
+            assert session is not None
+            content = utils._get_wavu_response_content(session, character, self._format, self._api_url)
+        digest = utils._get_response_digest(content)
+        char = previous if previous and previous.source_digest == digest else self._parse(char_meta, content, digest)
+        self._cache_content(character, content)
+        return char
+
+    async def get_frame_data_async(
+        self, character: CharacterName, session: aiohttp.ClientSession, previous: Character | None = None
+    ) -> Character:
+        char_meta = self._get_character_meta(character)
+        loop = asyncio.get_running_loop()
+
+        # parsing is CPU-bound and the cache is on disk, so keep both off the event loop
+        content = await loop.run_in_executor(None, self._get_cached_content, character, previous)
+        if content is not None:
+            return await loop.run_in_executor(
+                self._get_parse_pool(),
+                _create_character,
+                char_meta,
+                content,
+                utils._get_response_digest(content),
+                self._format,
+            )
+
+        content = self._prefetched.pop(character, None)
+        if content is None:
+            content = await utils._get_wavu_response_content_async(session, character, self._format, self._api_url)
+        digest = utils._get_response_digest(content)
+        if previous and previous.source_digest == digest:
+            char = previous
+        else:
+            char = await loop.run_in_executor(
+                self._get_parse_pool(), _create_character, char_meta, content, digest, self._format
+            )
+        await loop.run_in_executor(None, self._cache_content, character, content)
+        return char
+
+    def prefetch(self, characters: Mapping[CharacterName, Character | None], session: requests.Session | None = None) -> None:
+        self._prefetched = {}
+        bulk_characters = self._get_bulk_characters(characters)
+        if bulk_characters:
+            assert session is not None
+            rows = utils._get_wavu_bulk_rows(session, self._format, self._api_url)
+            self._prefetched = utils._split_rows_by_character(rows, bulk_characters)
+            logger.info(f"Fetched {len(rows)} moves for {len(bulk_characters)} characters in bulk")
+
+    async def prefetch_async(
+        self, characters: Mapping[CharacterName, Character | None], session: aiohttp.ClientSession
+    ) -> None:
+        self._prefetched = {}
+        bulk_characters = self._get_bulk_characters(characters)
+        if bulk_characters:
+            rows = await utils._get_wavu_bulk_rows_async(session, self._format, self._api_url)
+            self._prefetched = await asyncio.get_running_loop().run_in_executor(
+                None, utils._split_rows_by_character, rows, bulk_characters
+            )
+            logger.info(f"Fetched {len(rows)} moves for {len(bulk_characters)} characters in bulk")
+
+    def _get_bulk_characters(self, characters: Mapping[CharacterName, Character | None]) -> List[CharacterName]:
+        "Get the characters to fetch in bulk, i.e., the ones that won't come from the cache, if there are enough of them"
+
+        if not self._bulk_fetch:
+            return []
+        bulk_characters = [
+            character
+            for character, previous in characters.items()
+            if self._cache is None or previous is not None or not self._cache.is_fresh(character)
+        ]
+        return bulk_characters if len(bulk_characters) >= BULK_FETCH_MIN_CHARACTERS else []
+
+    def _get_cached_content(self, character: CharacterName, previous: Character | None) -> bytes | None:
+        """
+        Get a fresh cached response for a character that hasn't been loaded yet, e.g., on a (re)start.
+
+        A character that has been loaded is always fetched, since a refresh is meant to get the latest frame data.
+        """
+
+        if self._cache is None or previous is not None:
+            return None
+        content = self._cache.get(character)
+        if content is not None:
+            logger.debug(f"Using cached response for {character.value} from {self._cache.cache_dir}")
+            self._served_from_cache.add(character)
+        return content
+
+    def _cache_content(self, character: CharacterName, content: bytes) -> None:
+        "Write a response that was successfully fetched and parsed through to the cache"
+
+        self._served_from_cache.discard(character)
+        if self._cache is not None:
+            self._cache.put(character, content)
+
+    def get_changed_characters(
+        self, since: datetime.datetime, session: requests.Session | None = None
+    ) -> Set[CharacterName] | None:
+        assert session is not None
+        changes = utils._get_recent_changes(session, since - RECENT_CHANGES_SLACK, self._api_url)
+        return self._get_changed_characters(changes) | self._served_from_cache
+
+    async def get_changed_characters_async(
+        self, since: datetime.datetime, session: aiohttp.ClientSession
+    ) -> Set[CharacterName] | None:
+        changes = await utils._get_recent_changes_async(session, since - RECENT_CHANGES_SLACK, self._api_url)
+        return self._get_changed_characters(changes) | self._served_from_cache
+
+    def _get_changed_characters(self, changes: List[Dict[str, Any]]) -> Set[CharacterName]:
+        "Get the characters affected by a list of recent changes"
+
+        if any(change["ns"] == utils.TEMPLATE_NAMESPACE for change in changes):
+            return set(self._movelist_titles.values())
+        return {self._movelist_titles[change["title"]] for change in changes if change["title"] in self._movelist_titles}
+
+    def _get_character_meta(self, character: CharacterName) -> Dict[str, str]:
+        "Get the metadata for a character"
+
         target_char_meta = None
         for char_meta in self.character_meta:
             if char_meta["name"] == character.value:
@@ -31,16 +209,50 @@ class Wavu(FrameService):
                 break
         if target_char_meta is None:
             raise Exception(f"Could not find character meta data for {character.value}")
+        return target_char_meta
 
-        name = CharacterName(target_char_meta["name"])
-        portrait = target_char_meta["portrait"]
-        page = target_char_meta["page"]
+    def _parse(self, char_meta: Dict[str, str], content: bytes, digest: str) -> Character:
+        "Parse a raw Wavu API response into a character, in the parse pool if there is one"
 
-        assert session is not None
-        response = utils._get_wavu_response(session, name, self._format)
-        movelist = utils._get_wavu_character_movelist(response, self._format)
-        char = Character(name, portrait, movelist, page)
-        return char
+        parse_pool = self._get_parse_pool()
+        if parse_pool is None:
+            return _create_character(char_meta, content, digest, self._format)
+        return parse_pool.submit(_create_character, char_meta, content, digest, self._format).result()
+
+    def _get_parse_pool(self) -> ProcessPoolExecutor | None:
+        "Get the pool of processes to parse responses in, starting it if it hasn't been started yet"
+
+        if self._parse_workers <= 0:
+            return None
+        with self._parse_pool_lock:
+            if self._parse_pool is None:
+                # the bot is multi-threaded by the time a refresh runs, so don't fork
+                self._parse_pool = ProcessPoolExecutor(
+                    max_workers=self._parse_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._parse_pool
+
+    def close(self) -> None:
+        "Shut down the parse pool, if it was started"
+
+        with self._parse_pool_lock:
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown()
+                self._parse_pool = None
 
     def get_move_url(self, character: Character, move: Move) -> Url | None:
         return f"{character.page}_movelist#{move.id.replace(' ', '_')}"
+
+
+def _create_character(char_meta: Dict[str, str], content: bytes, digest: str, format: str = "json") -> Character:
+    "Create a character from its metadata and a raw Wavu API response. Runs in a parse pool process, if there is one."
+
+    name = CharacterName(char_meta["name"])
+    portrait = char_meta["portrait"]
+    page = char_meta["page"]
+
+    response = json.loads(content)
+    utils._check_page(response.get("cargoquery", []), utils.CARGO_QUERY_LIMIT, f"the movelist of {name.value}")
+    movelist = utils._get_wavu_character_movelist(response, format)
+    char = Character(name, portrait, movelist, page, source_digest=digest)
+    return char
@@ -1,7 +1,12 @@
 from .character import Character as Character
 from .character import Move as Move
+from .character import MovelistDiff as MovelistDiff
 from .character import Url as Url
 from .const import CharacterName as CharacterName
 from .const import MoveType as MoveType
+from .frame_service import AsyncFrameService as AsyncFrameService
 from .frame_service import FrameService as FrameService
+from .framedb import CharacterSource as CharacterSource
+from .framedb import ExportReport as ExportReport
 from .framedb import FrameDb as FrameDb
+from .framedb import LoadReport as LoadReport
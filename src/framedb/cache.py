@@ -0,0 +1,60 @@
+"""
+Caches for frame database queries.
+"""
+
+import collections
+from typing import Callable, Generic, Hashable, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class QueryCache(Generic[K, V]):
+    """
+    A bounded least-recently-used cache of query results.
+
+    Every entry is tagged with the version of the data it was computed from, e.g., a generation or a content hash.
+    Entries from another version are treated as misses and dropped when they are next looked up.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        if not maxsize > 0:
+            raise ValueError("maxsize must be > 0: %r" % (maxsize,))
+        self.maxsize = maxsize
+        self._entries: collections.OrderedDict[K, Tuple[Hashable, V]] = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K, version: Hashable) -> V | None:
+        "Look up the cached result of a query for a version of the data, or None if there isn't one"
+
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: K, version: Hashable, value: V) -> None:
+        "Cache the result of a query, evicting the least recently used entry if the cache is full"
+
+        self._entries[key] = (version, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, predicate: Callable[[K], bool]) -> int:
+        "Drop the entries whose keys match a predicate, and return how many were dropped"
+
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
@@ -1,9 +1,11 @@
+import hashlib
 import json
 import logging
-from dataclasses import dataclass
-from typing import Dict, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Tuple
 
 from .const import CharacterName
+from .files import write_atomically
 
 logger = logging.getLogger("main")
 
@@ -29,6 +31,80 @@ class Move:
     alias: Tuple[DiscordMd, ...] = ()
     alt: Tuple[DiscordMd, ...] = ()
 
+    "The ID of the move this move is a follow-up of, if any"
+    parent: str = ""
+
+
+def _get_move_hash(move: Move) -> str:
+    "Hash the content of a move, i.e., all of its fields, in a way that is stable across processes and runs"
+
+    content = json.dumps(vars(move), ensure_ascii=False)
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+@dataclass(frozen=True)
+class MovelistDiff:
+    "The IDs of the moves that were added, removed or changed between two versions of a movelist, in movelist order"
+
+    added: Tuple[str, ...] = ()
+    removed: Tuple[str, ...] = ()
+    changed: Tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+@dataclass(frozen=True)
+class MoveTree:
+    "The parent/child structure of a movelist, i.e., which moves are follow-ups of which"
+
+    "The ID of the parent of each move that has one in the movelist"
+    parents: Mapping[str, str]
+
+    "The IDs of the follow-ups of each move that has any, in movelist order"
+    children: Mapping[str, Tuple[str, ...]]
+
+    "The ID of the first move of the string each move belongs to, which is the move itself if it has no parent"
+    roots: Mapping[str, str]
+
+    @staticmethod
+    def build(movelist: Dict[str, Move]) -> "MoveTree":
+        """
+        Build the move tree of a movelist in linear time.
+
+        A parent that isn't in the movelist is ignored. The root of each move is resolved once, by walking up to the
+        nearest move whose root is already known and assigning it to every move on the way.
+        """
+
+        parents = {move.id: move.parent for move in movelist.values() if move.parent and move.parent in movelist}
+        children: Dict[str, List[str]] = {}
+        for move_id, parent in parents.items():
+            children.setdefault(parent, []).append(move_id)
+
+        roots: Dict[str, str] = {}
+        for move_id in movelist:
+            path = []
+            on_path = set()
+            curr_id = move_id
+            while curr_id not in roots and curr_id in parents and curr_id not in on_path:
+                path.append(curr_id)
+                on_path.add(curr_id)
+                curr_id = parents[curr_id]
+            if curr_id in on_path:
+                logger.warning(f"Move {curr_id} is its own ancestor, treating it as the start of its string")
+                roots[curr_id] = curr_id
+            root = roots.get(curr_id, curr_id)
+            for path_id in path:
+                roots.setdefault(path_id, root)
+            roots.setdefault(curr_id, root)
+
+        # plain dicts rather than read-only proxies, so that characters can be pickled, e.g., by a parse pool
+        return MoveTree(
+            parents=parents,
+            children={move_id: tuple(follow_ups) for move_id, follow_ups in children.items()},
+            roots=roots,
+        )
+
 
 @dataclass
 class Character:
@@ -43,23 +119,83 @@ class Character:
     "The URL of the character's page to link to in embeds"
     page: Url
 
-    def export_movelist(self, movelist_path: str, format: str = "json") -> None:
-        "Export a character's movelist to a file."
+    "A digest of the raw data the character was created from, if the frame service provides one"
+    source_digest: str = field(default="", compare=False)
+
+    "The parent/child structure of the movelist, built when the character is created"
+    move_tree: MoveTree = field(init=False, compare=False, repr=False)
+
+    "A stable hash of the content of each move by move ID, computed when the character is created"
+    move_hashes: Mapping[str, str] = field(init=False, compare=False, repr=False)
+
+    "A stable hash of the character's content, including the order of its movelist, computed when it is created"
+    content_hash: str = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.move_tree = MoveTree.build(self.movelist)
+        self.move_hashes = {move_id: _get_move_hash(move) for move_id, move in self.movelist.items()}
+        content = json.dumps([self.name.value, self.portrait, self.page, list(self.move_hashes.items())])
+        self.content_hash = hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+    def diff(self, previous: "Character | None") -> MovelistDiff:
+        "Get the moves that were added, removed or changed since a previous version of the character, if any"
+
+        if previous is None:
+            return MovelistDiff(added=tuple(self.move_hashes))
+        if previous.content_hash == self.content_hash:
+            return MovelistDiff()
+
+        old, new = previous.move_hashes, self.move_hashes
+        return MovelistDiff(
+            added=tuple(move_id for move_id in new if move_id not in old),
+            removed=tuple(move_id for move_id in old if move_id not in new),
+            changed=tuple(move_id for move_id, move_hash in new.items() if move_id in old and old[move_id] != move_hash),
+        )
+
+    def get_parent(self, move_id: str) -> Move | None:
+        "Get the move that a move is a follow-up of, if any"
+
+        parent = self.move_tree.parents.get(move_id)
+        return self.movelist[parent] if parent else None
+
+    def get_children(self, move_id: str) -> List[Move]:
+        "Get the follow-ups of a move, in movelist order"
+
+        return [self.movelist[child] for child in self.move_tree.children.get(move_id, ())]
+
+    def get_root(self, move_id: str) -> Move | None:
+        "Get the first move of the string a move belongs to, which is the move itself if it has no parent"
+
+        root = self.move_tree.roots.get(move_id)
+        return self.movelist[root] if root else None
+
+    def encode_movelist(self, format: str = "json", compact: bool = False) -> bytes:
+        "Encode a character's movelist in a format, either compactly or indented for readability"
 
         match format:
             case "json":
-                try:
-                    with open(movelist_path, "w", encoding="utf-8") as outfile:
-                        json.dump(
-                            list(self.movelist.values()),
-                            outfile,
-                            sort_keys=True,
-                            default=vars,
-                            indent=4,
-                            ensure_ascii=False,
-                        )
-                except Exception as e:
-                    logger.error(f"Error writing to file: {e}")
+                return json.dumps(
+                    list(self.movelist.values()),
+                    sort_keys=True,
+                    default=vars,
+                    indent=None if compact else 4,
+                    separators=(",", ":") if compact else None,
+                    ensure_ascii=False,
+                ).encode("utf-8")
             case _:
-                logger.error(f"Unsupported format: {format}")
-                return
+                raise Exception(f"Unsupported format: {format}")
+
+    def export_movelist(self, movelist_path: str, format: str = "json", compact: bool = False) -> int | None:
+        """
+        Export a character's movelist to a file, replacing it atomically.
+
+        Returns the number of bytes written, or None if the movelist couldn't be exported.
+        """
+
+        try:
+            content = self.encode_movelist(format, compact=compact)
+            write_atomically(movelist_path, content)
+        except Exception as e:
+            logger.error(f"Error writing to file: {e}")
+            return None
+        return len(content)
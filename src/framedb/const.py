@@ -82,6 +82,12 @@ CHARACTER_ALIAS: Dict[CharacterName, List[str]] = {
     CharacterName.VICTOR: ["vic"],
 }
 
+"A flat lookup from every character name and alias to its character, where names take precedence over aliases"
+CHARACTER_NAME_LOOKUP: Dict[str, CharacterName] = {character.value: character for character in CharacterName}
+for character, aliases in CHARACTER_ALIAS.items():
+    for alias in aliases:
+        CHARACTER_NAME_LOOKUP.setdefault(alias, character)
+
 
 class MoveType(enum.Enum):
     RA = "Rage Art"
@@ -0,0 +1,28 @@
+"""
+Helpers for writing files that other processes may be reading.
+"""
+
+import os
+import secrets
+
+
+def write_atomically(path: str, content: bytes) -> None:
+    """
+    Write a file by writing a temporary file next to it and renaming it, so that the file is never left half-written.
+
+    The temporary file is created with the permissions a new file would get under the umask, and flushed to disk before
+    it replaces the file, so that the file can't turn up empty after a power loss either.
+    """
+
+    directory, filename = os.path.split(path)
+    temp_path = os.path.join(directory, f".{filename}.{secrets.token_hex(8)}.tmp")
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
@@ -1,5 +1,8 @@
 import abc
+import datetime
+from typing import Mapping, Set
 
+import aiohttp
 import requests
 
 from framedb import Character, CharacterName, Move, Url
@@ -15,16 +18,72 @@ class FrameService(abc.ABC):
 
     @abc.abstractmethod
     def get_frame_data(
-        self, character: CharacterName, session: requests.Session | None = None
+        self, character: CharacterName, session: requests.Session | None = None, previous: Character | None = None
     ) -> Character | None:  # TODO: is there a better argument order?
         """
         Get the frame data for a character from the service
+
+        If the previously retrieved frame data for the character is given and the service can tell that it hasn't
+        changed, the service may return it as is.
         """
         pass
 
+    def prefetch(self, characters: Mapping[CharacterName, Character | None], session: requests.Session | None = None) -> None:
+        """
+        Prepare to get the frame data for a number of characters, given their previously retrieved frame data
+
+        Called once before get_frame_data is called for each of them, e.g., to fetch their frame data in bulk.
+        """
+        pass
+
+    def get_changed_characters(
+        self, since: datetime.datetime, session: requests.Session | None = None
+    ) -> Set[CharacterName] | None:
+        """
+        Get the characters whose frame data may have changed since a point in time
+
+        Returns None if the service can't tell, in which case every character has to be retrieved again.
+        """
+        return None
+
     @abc.abstractmethod
     def get_move_url(self, character: Character, move: Move) -> Url | None:
         """
         Get the URL for a move in the character's movelist to be used in the embed
         """
         pass
+
+
+class AsyncFrameService(FrameService):
+    """
+    A frame service that can also retrieve frame data asynchronously, so that it can run on an event loop.
+    """
+
+    @abc.abstractmethod
+    async def get_frame_data_async(
+        self, character: CharacterName, session: aiohttp.ClientSession, previous: Character | None = None
+    ) -> Character | None:
+        """
+        Get the frame data for a character from the service asynchronously
+
+        Like get_frame_data, the previously retrieved frame data may be returned as is if it hasn't changed.
+        """
+        pass
+
+    async def get_changed_characters_async(
+        self, since: datetime.datetime, session: aiohttp.ClientSession
+    ) -> Set[CharacterName] | None:
+        """
+        Get the characters whose frame data may have changed since a point in time asynchronously
+
+        Like get_changed_characters, returns None if the service can't tell.
+        """
+        return None
+
+    async def prefetch_async(
+        self, characters: Mapping[CharacterName, Character | None], session: aiohttp.ClientSession
+    ) -> None:
+        """
+        Prepare to get the frame data for a number of characters asynchronously, like prefetch
+        """
+        pass
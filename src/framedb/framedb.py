@@ -1,106 +1,803 @@
+import asyncio
+import collections
+import copyreg
+import dataclasses
+import datetime
+import enum
+import hashlib
+import io
+import json
 import logging
 import os
+import pickle
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from difflib import SequenceMatcher
 from heapq import nlargest as _nlargest
-from typing import Dict, List, Tuple
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Set, Tuple, TypeVar
 
+import aiohttp
 import requests
+import requests.adapters
 from fast_autocomplete import AutoComplete
 
-from .character import Character, Move
-from .const import CHARACTER_ALIAS, MOVE_TYPE_ALIAS, REPLACE, CharacterName, MoveType
-from .frame_service import FrameService
+from .cache import QueryCache
+from .character import Character, Move, MovelistDiff, MoveTree
+from .const import CHARACTER_ALIAS, CHARACTER_NAME_LOOKUP, MOVE_TYPE_ALIAS, CharacterName, MoveType
+from .files import write_atomically
+from .frame_service import AsyncFrameService, FrameService
+from .index import QGramIndex, SubstringIndex
+from .notation import simplify_input
 
 logger = logging.getLogger("main")
 
+T = TypeVar("T")
+
+"The file in an export directory that records the content hash of each file exported to it"
+EXPORT_MANIFEST_FILE = "export_manifest.json"
+
+"The file in an export directory that a snapshot of the whole frame database is exported to"
+SNAPSHOT_FILE = "framedb.snapshot"
+
+"The first bytes of a snapshot file"
+SNAPSHOT_MAGIC = b"HEIHACHI"
+
+"The version of the snapshot format. Bump it whenever the pickled classes change in a way that the fingerprint misses."
+SNAPSHOT_SCHEMA_VERSION = 1
+
+"The header of a snapshot file: the magic, the schema version, the schema fingerprint and the SHA-256 of the payload"
+SNAPSHOT_HEADER = struct.Struct(">8sI16s32s")
+
 # TODO: refactor the query methods - simplify + handle alts and aliases correctly
 
 
+class CommandTier(enum.IntEnum):
+    "The kind of command a move was matched by, in order of priority"
+
+    INPUT = 0
+    ALT = 1
+    ALIAS = 2
+
+
+class SearchStage(enum.Enum):
+    "The stages of a move search, in the order they are tried"
+
+    INPUT = "input"
+    NAME = "name"
+    FUZZY_INPUT = "fuzzy input"
+
+
+@dataclass
+class SearchTrace:
+    "A record of how a move query was resolved by the search pipeline"
+
+    query: str
+
+    "The stage that resolved the query, i.e., the last stage that was evaluated"
+    stage: SearchStage | None = None
+
+    "The number of candidates examined by each evaluated stage"
+    candidates: Dict[SearchStage, int] = field(default_factory=dict)
+
+    "The time spent in each evaluated stage, in seconds"
+    durations: Dict[SearchStage, float] = field(default_factory=dict)
+
+
+class CharacterSource(enum.Enum):
+    "Where the frame data of a character came from in a load, in order of preference"
+
+    PRIMARY = "frame service"
+    PREVIOUS = "previous data"
+    FALLBACK = "fallback frame service"
+
+
+@dataclass
+class LoadReport:
+    "A record of where the frame data of each character came from in a load"
+
+    "The source of each character's frame data. Characters that couldn't be loaded from any source are left out."
+    sources: Dict[CharacterName, CharacterSource]
+
+    "The error each character that failed to be retrieved from the frame service failed with"
+    errors: Dict[CharacterName, BaseException] = field(default_factory=dict)
+
+    "The moves that changed for each character whose frame data changed in the load"
+    changes: Dict[CharacterName, MovelistDiff] = field(default_factory=dict)
+
+    @property
+    def missing(self) -> List[CharacterName]:
+        return [character for character in CharacterName if character not in self.sources]
+
+    def summary(self) -> str:
+        "Summarize the report in a line for logging"
+
+        counts = collections.Counter(self.sources.values())
+        summary = ", ".join(f"{counts[source]} from {source.value}" for source in CharacterSource if counts[source])
+        if self.missing:
+            summary += f", missing {', '.join(character.value for character in self.missing)}"
+        return summary
+
+
+@dataclass
+class ExportReport:
+    "A record of what an export wrote"
+
+    "The number of bytes written for each character that was exported"
+    bytes_written: Dict[CharacterName, int] = field(default_factory=dict)
+
+    "The time it took to export each character that was exported, in seconds"
+    durations: Dict[CharacterName, float] = field(default_factory=dict)
+
+    "The characters that weren't exported because their export is up to date"
+    skipped: List[CharacterName] = field(default_factory=list)
+
+    "The characters that couldn't be exported"
+    failed: List[CharacterName] = field(default_factory=list)
+
+    "The error writing each path that isn't a character's movelist, e.g., the export manifest or the snapshot, failed with"
+    errors: Dict[str, BaseException] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        "Summarize the report in a line for logging"
+
+        summary = (
+            f"{len(self.bytes_written)} characters written ({sum(self.bytes_written.values())} bytes "
+            f"in {sum(self.durations.values()):.2f}s), {len(self.skipped)} unchanged"
+        )
+        if self.failed:
+            summary += f", failed {', '.join(character.value for character in self.failed)}"
+        if self.errors:
+            summary += f", failed to write {', '.join(self.errors)}"
+        return summary
+
+
+@dataclass
+class SearchStageStats:
+    "Cumulative statistics for a stage of the search pipeline. A query reaches a stage only if no earlier stage resolved it."
+
+    runs: int = 0
+    candidates: int = 0
+    duration: float = 0.0
+
+
+@dataclass(frozen=True)
+class CharacterIndex:
+    "Lookup structures over a character's movelist, built once when the character is loaded"
+
+    "A map from simplified inputs, alts and aliases to the moves they match and the tier they match by"
+    commands: Mapping[str, Tuple[CommandTier, Move]]
+
+    "A q-gram index over simplified inputs and alts for fuzzy input matching"
+    fuzzy_inputs: QGramIndex
+
+    "The move each command in the fuzzy input index belongs to"
+    fuzzy_input_moves: Tuple[Move, ...]
+
+    "A substring index over lowercased move names"
+    names: SubstringIndex
+
+    "The move each name in the name index belongs to"
+    name_moves: Tuple[Move, ...]
+
+    "The moves of each move type, sorted by input in the order they are listed in embeds"
+    move_types: Mapping[MoveType, Tuple[Move, ...]]
+
+    @staticmethod
+    def build(character: Character) -> "CharacterIndex":
+        "Build the lookup structures for a character."
+
+        movelist = list(character.movelist.values())
+
+        # inputs beat alts which beat aliases, and within a tier the first move in movelist order wins
+        commands: Dict[str, Tuple[CommandTier, Move]] = {}
+        for tier in CommandTier:
+            for move in movelist:
+                match tier:
+                    case CommandTier.INPUT:
+                        tier_commands: Tuple[str, ...] = (move.input,)
+                    case CommandTier.ALT:
+                        tier_commands = tuple(move.alt)
+                    case CommandTier.ALIAS:
+                        tier_commands = tuple(move.alias)
+                for command in tier_commands:
+                    commands.setdefault(FrameDb._simplify_input(command), (tier, move))
+
+        fuzzy_inputs, fuzzy_input_moves = [], []
+        for move in movelist:
+            for command in (move.input, *move.alt):
+                fuzzy_inputs.append(FrameDb._simplify_input(command))
+                fuzzy_input_moves.append(move)
+
+        move_types: Dict[MoveType, List[Move]] = {move_type: [] for move_type in MoveType}
+        for move in movelist:
+            for move_type in FrameDb._get_move_types(move):
+                move_types[move_type].append(move)
+
+        return CharacterIndex(
+            commands=MappingProxyType(commands),
+            # notation is short, so bigrams prune far more candidates than trigrams
+            fuzzy_inputs=QGramIndex(fuzzy_inputs, q=2),
+            fuzzy_input_moves=tuple(fuzzy_input_moves),
+            names=SubstringIndex([move.name.lower() for move in movelist]),
+            name_moves=tuple(movelist),
+            move_types=MappingProxyType(
+                {
+                    move_type: tuple(sorted(moves, key=lambda move: move.input.replace("*", "\\*")))
+                    for move_type, moves in move_types.items()
+                }
+            ),
+        )
+
+
+@dataclass(frozen=True)
+class FrameDbSnapshot:
+    """
+    A complete, immutable view of the frame database.
+
+    Snapshots are built off to the side and published with a single reference swap, so readers never see partially
+    loaded data.
+    """
+
+    frames: Mapping[CharacterName, Character]
+    indexes: Mapping[CharacterName, CharacterIndex]
+    autocomplete: AutoComplete
+
+    "Incremented whenever the frame data is (re)loaded"
+    generation: int
+
+    "The name of the frame service the frame data was retrieved from"
+    source: str | None = None
+
+    "When the frame data was last retrieved from the frame service, i.e., when that load started"
+    retrieved_at: datetime.datetime | None = None
+
+    "Where the frame data of each character came from. Only PRIMARY frame data is current as of retrieved_at."
+    sources: Mapping[CharacterName, CharacterSource] = field(default_factory=lambda: MappingProxyType({}))
+
+    @staticmethod
+    def build(
+        frames: Dict[CharacterName, Character],
+        generation: int,
+        previous: "FrameDbSnapshot | None" = None,
+        source: str | None = None,
+        retrieved_at: datetime.datetime | None = None,
+        sources: Dict[CharacterName, CharacterSource] | None = None,
+    ) -> "FrameDbSnapshot":
+        """
+        Build a snapshot with the lookup structures and autocomplete for a set of characters.
+
+        The lookup structures of a character whose frame data is the same object as in the previous snapshot are reused
+        rather than rebuilt.
+        """
+
+        indexes = {
+            character_name: (
+                previous.indexes[character_name]
+                if previous and previous.frames.get(character_name) is character
+                else CharacterIndex.build(character)
+            )
+            for character_name, character in frames.items()
+        }
+        return FrameDbSnapshot(
+            frames=MappingProxyType(dict(frames)),
+            indexes=MappingProxyType(indexes),
+            autocomplete=FrameDbSnapshot._build_autocomplete(frames.keys()),
+            generation=generation,
+            source=source,
+            retrieved_at=retrieved_at,
+            sources=MappingProxyType(dict(sources or {})),
+        )
+
+    @staticmethod
+    def _build_autocomplete(characters: Iterable[CharacterName]) -> AutoComplete:
+        "Build the autocomplete for character names and their aliases"
+
+        characters = list(characters)
+        words: Dict[str, Dict[str, str]] = {character.pretty().lower(): {} for character in characters}
+        synonyms = {character.pretty().lower(): CHARACTER_ALIAS[character] for character in characters}
+        return AutoComplete(words=words, synonyms=synonyms)
+
+    def serialize(self) -> bytes:
+        """
+        Serialize the snapshot, including the lookup structures of each character, into a versioned binary format.
+
+        The autocomplete holds a lock, so it is left out and rebuilt on deserialization, which takes about a millisecond.
+        """
+
+        state = {f.name: getattr(self, f.name) for f in dataclasses.fields(self) if f.name != "autocomplete"}
+        buffer = io.BytesIO()
+        pickler = pickle.Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL)
+        pickler.dispatch_table = copyreg.dispatch_table.copy()
+        pickler.dispatch_table[MappingProxyType] = lambda mapping: (_read_only, (dict(mapping),))
+        pickler.dump(state)
+        payload = buffer.getvalue()
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_SCHEMA_VERSION, _get_snapshot_fingerprint(), hashlib.sha256(payload).digest()
+        )
+        return header + payload
+
+    @staticmethod
+    def deserialize(content: bytes) -> "FrameDbSnapshot":
+        """
+        Deserialize a snapshot. Raises an exception if it isn't a snapshot, has another schema or fails its checksum.
+
+        The payload is unpickled, so only deserialize snapshots that the bot exported itself.
+        """
+
+        if len(content) < SNAPSHOT_HEADER.size:
+            raise Exception("Snapshot is truncated")
+        magic, version, fingerprint, checksum = SNAPSHOT_HEADER.unpack_from(content)
+        if magic != SNAPSHOT_MAGIC:
+            raise Exception("Not a frame data snapshot")
+        if version != SNAPSHOT_SCHEMA_VERSION or fingerprint != _get_snapshot_fingerprint():
+            raise Exception(f"Snapshot has schema version {version}, expected {SNAPSHOT_SCHEMA_VERSION}, or another schema")
+        payload = memoryview(content)[SNAPSHOT_HEADER.size :]
+        if hashlib.sha256(payload).digest() != checksum:
+            raise Exception("Snapshot checksum mismatch")
+
+        state: Dict[str, Any] = pickle.loads(payload)
+        return FrameDbSnapshot(autocomplete=FrameDbSnapshot._build_autocomplete(state["frames"].keys()), **state)
+
+    def diff(self, previous: "FrameDbSnapshot") -> Dict[CharacterName, MovelistDiff]:
+        """
+        Get the moves that changed for each character whose frame data changed since a previous snapshot.
+
+        Characters are compared by content hash, so only the characters that changed are compared move by move.
+        """
+
+        changes = {}
+        for character_name in CharacterName:
+            character, previous_character = self.frames.get(character_name), previous.frames.get(character_name)
+            if character is None and previous_character is not None:
+                changes[character_name] = MovelistDiff(removed=tuple(previous_character.move_hashes))
+            elif character is not None and (
+                previous_character is None or character.content_hash != previous_character.content_hash
+            ):
+                changes[character_name] = character.diff(previous_character)
+        return changes
+
+
+def _read_only(mapping: Dict[Any, Any]) -> Mapping[Any, Any]:
+    "Wrap a dictionary in a read-only view again when a snapshot is unpickled"
+
+    return MappingProxyType(mapping)
+
+
+def _get_snapshot_fingerprint() -> bytes:
+    "Get a fingerprint of the fields of the classes in a snapshot, so that a snapshot of other classes isn't loaded"
+
+    classes = (Move, MoveTree, Character, CharacterIndex, FrameDbSnapshot)
+    layout = [(cls.__qualname__, [f.name for f in dataclasses.fields(cls)]) for cls in classes]
+    return hashlib.blake2b(json.dumps(layout).encode(), digest_size=16).digest()
+
+
 class FrameDb:
     """
     An in-memory "database" of frame data for all characters that is used
     to query frame data while the bot is running.
+
+    The data is held in an immutable snapshot that is replaced as a whole on every load. Queries read the current
+    snapshot once and never take locks.
     """
 
-    def __init__(self) -> None:
-        self.frames: Dict[CharacterName, Character] = {}
+    def __init__(self, query_cache_size: int = 1024) -> None:
+        self._snapshot = FrameDbSnapshot.build({}, generation=0)
+        self.search_stats: Dict[SearchStage, SearchStageStats] = {stage: SearchStageStats() for stage in SearchStage}
+        self.query_cache: QueryCache[Tuple[CharacterName, str], Move | Tuple[Move, ...]] = QueryCache(query_cache_size)
+
+    @property
+    def frames(self) -> Mapping[CharacterName, Character]:
+        return self._snapshot.frames
 
-    def export(self, export_dir_path: str, format: str = "json") -> None:
-        "Export the frame database in a particular format."
+    @property
+    def autocomplete(self) -> AutoComplete:
+        return self._snapshot.autocomplete
 
-        if not os.path.exists(export_dir_path):
-            os.makedirs(export_dir_path)
+    @property
+    def generation(self) -> int:
+        return self._snapshot.generation
+
+    def export(self, export_dir_path: str, format: str = "json", compact: bool = False) -> ExportReport:
+        """
+        Export the frame database in a particular format, either compactly or indented for readability.
+
+        Each file is written to a temporary file that then replaces it, so an interrupted export never leaves a
+        truncated file behind. The content hash of each exported file is recorded in a manifest in the directory, and
+        characters whose file is up to date are skipped, including after a restart.
+
+        The snapshot format exports the whole frame database, including its lookup structures, to a single file that
+        load_snapshot can load on startup.
+
+        Errors are logged and recorded in the report rather than raised, since the frame database is usable either way.
+        """
+
+        report = ExportReport()
+        try:
+            os.makedirs(export_dir_path, exist_ok=True)
+        except Exception as e:
+            logger.error(f"Could not create export directory {export_dir_path}: {e}")
+            report.errors[export_dir_path] = e
+            return report
 
         match format:
             case "json":
+                manifest = FrameDb._read_export_manifest(export_dir_path)
                 for character in self.frames.values():
-                    character.export_movelist(os.path.join(export_dir_path, f"{character.name.value}.{format}"), format=format)
+                    filename = f"{character.name.value}.{format}"
+                    path = os.path.join(export_dir_path, filename)
+                    entry: Dict[str, str | bool] = {"content_hash": character.content_hash, "compact": compact}
+                    if manifest.get(filename) == entry and os.path.exists(path):
+                        report.skipped.append(character.name)
+                        continue
+
+                    start = time.perf_counter()
+                    bytes_written = character.export_movelist(path, format=format, compact=compact)
+                    if bytes_written is None:
+                        report.failed.append(character.name)
+                        manifest.pop(filename, None)
+                        continue
+                    report.bytes_written[character.name] = bytes_written
+                    report.durations[character.name] = time.perf_counter() - start
+                    manifest[filename] = entry
                     logger.info(
-                        f"Exported frame data for {character.name.value} to {export_dir_path}/{character.name.value}.{format}"
+                        f"Exported frame data for {character.name.value} to {path} "
+                        f"({bytes_written} bytes in {report.durations[character.name]:.3f}s)"
                     )
+                manifest_path = os.path.join(export_dir_path, EXPORT_MANIFEST_FILE)
+                try:
+                    write_atomically(manifest_path, json.dumps(manifest, indent=4, sort_keys=True).encode())
+                except Exception as e:
+                    logger.error(f"Could not write export manifest {manifest_path}: {e}")
+                    report.errors[manifest_path] = e
+            case "snapshot":
+                path = os.path.join(export_dir_path, SNAPSHOT_FILE)
+                start = time.perf_counter()
+                try:
+                    content = self._snapshot.serialize()
+                    write_atomically(path, content)
+                except Exception as e:
+                    logger.error(f"Could not export frame data snapshot to {path}: {e}")
+                    report.errors[path] = e
+                    return report
+                logger.info(
+                    f"Exported frame data snapshot to {path} ({len(content)} bytes in {time.perf_counter() - start:.3f}s)"
+                )
+                return report
+            case _:
+                logger.error(f"Unsupported format: {format}")
+        logger.info(f"Exported frame data to {export_dir_path}: {report.summary()}")
+        return report
+
+    def load_snapshot(self, export_dir_path: str) -> bool:
+        """
+        Load the frame database from a snapshot exported to a directory, e.g., to start up without retrieving anything.
+
+        Returns False if there is no snapshot or it can't be loaded, e.g., because it has another schema version or is
+        corrupted, in which case the frame database should be loaded from a frame service instead.
+        """
 
-    def load(self, frame_service: FrameService) -> None:
-        "Load the frame database using a frame service."
+        path = os.path.join(export_dir_path, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            logger.info(f"No frame data snapshot at {path}")
+            return False
+
+        start = time.perf_counter()
+        try:
+            with open(path, "rb") as f:
+                snapshot = FrameDbSnapshot.deserialize(f.read())
+        except Exception as e:
+            logger.warning(f"Could not load frame data snapshot from {path}: {e}")
+            return False
+
+        previous = self._snapshot
+        snapshot = dataclasses.replace(snapshot, generation=previous.generation + 1)
+        self._publish(snapshot, LoadReport(sources=dict(snapshot.sources), changes=snapshot.diff(previous)))
+        logger.info(
+            f"Loaded frame data snapshot of {len(snapshot.frames)} characters from {path} "
+            f"in {time.perf_counter() - start:.3f}s"
+        )
+        return True
 
+    @staticmethod
+    def _read_export_manifest(export_dir_path: str) -> Dict[str, Dict[str, str | bool]]:
+        "Read the manifest of what was exported to a directory, or an empty one if there is no readable manifest"
+
+        manifest_path = os.path.join(export_dir_path, EXPORT_MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return {}
+        try:
+            with open(manifest_path, "r") as f:
+                manifest: Dict[str, Dict[str, str | bool]] = json.load(f)
+                return manifest
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable export manifest {manifest_path}: {e}")
+            return {}
+
+    def load(self, frame_service: FrameService, max_workers: int = 1, fallback: FrameService | None = None) -> LoadReport:
+        """
+        Load the frame database using a frame service.
+
+        Characters are fetched by up to max_workers threads that share a session. Each character's current frame data
+        is passed to the frame service, which may return it as is if it hasn't changed. A character that fails to load
+        keeps its current frame data, or is loaded from the fallback frame service if it has none, without affecting
+        the others. The load only fails if no character could be loaded from any source.
+
+        If the frame data was last loaded from the same frame service and it can tell which characters changed since,
+        only those characters are retrieved again. The frame service is given a chance to prefetch them all at once
+        before they are retrieved one by one.
+        """
+
+        retrieved_at = datetime.datetime.now(datetime.timezone.utc)
+        previous = self._snapshot.frames
+        results: Dict[CharacterName, Character | None | BaseException] = {}
         with requests.session() as session:  # TODO: assumes a frame service will always require a session
-            for character in CharacterName:
-                frames = frame_service.get_frame_data(character, session)
-                logger.info(f"Retrieved frame data for {character.value} from {frame_service.name}")
-                if frames:
-                    self.frames[character] = frames
-                else:
-                    logger.warning(f"Could not load frame data for {character}")
-        self._build_autocomplete()
-
-    def refresh(self, frame_service: FrameService, export_dir_path: str, format: str = "json") -> None:
-        "Refresh the frame database using a frame service."
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+            changed = None
+            since = self._get_retrieved_at(frame_service)
+            if since:
+                try:
+                    changed = frame_service.get_changed_characters(since, session)
+                except Exception as e:
+                    logger.warning(f"Could not get changed characters from {frame_service.name}: {e}")
+            characters = self._get_characters_to_load(frame_service, changed)
+            if characters:
+                try:
+                    frame_service.prefetch({character: previous.get(character) for character in characters}, session)
+                except Exception as e:
+                    logger.warning(f"Could not prefetch frame data from {frame_service.name}: {e}")
+
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="framedb-load") as executor:
+                futures = {
+                    character: executor.submit(
+                        FrameDb._load_character, frame_service, character, session, previous.get(character)
+                    )
+                    for character in characters
+                }
+                for character in CharacterName:
+                    if character not in futures:
+                        results[character] = previous[character]
+                        continue
+                    try:
+                        results[character] = futures[character].result()
+                    except Exception as e:
+                        results[character] = e
+        snapshot, report = self._build_snapshot(results, frame_service.name, retrieved_at, fallback)
+        self._publish(snapshot, report)
+        return report
+
+    async def load_async(
+        self, frame_service: AsyncFrameService, max_concurrency: int = 1, fallback: FrameService | None = None
+    ) -> LoadReport:
+        """
+        Load the frame database using a frame service, as a task on the running event loop.
 
-        logger.info(f"Refreshing frame data from {frame_service.name} and exporting to {export_dir_path}")
-        self.load(frame_service)
-        self.export(export_dir_path, format=format)
+        Up to max_concurrency characters are fetched at once over a shared session. As with load, a character that
+        fails to load falls back to its current frame data or the fallback frame service, and only the characters that
+        changed are retrieved again if the frame service can tell which those are.
+        """
+
+        retrieved_at = datetime.datetime.now(datetime.timezone.utc)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        previous = self._snapshot.frames
+
+        async def load_character(character: CharacterName, session: aiohttp.ClientSession) -> Character | None:
+            async with semaphore:
+                start = time.perf_counter()
+                frames = await frame_service.get_frame_data_async(character, session, previous.get(character))
+                logger.info(
+                    f"Retrieved frame data for {character.value} from {frame_service.name} in {time.perf_counter() - start:.2f}s"
+                )
+                return frames
+
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=max_concurrency)) as session:
+            changed = None
+            since = self._get_retrieved_at(frame_service)
+            if since:
+                try:
+                    changed = await frame_service.get_changed_characters_async(since, session)
+                except Exception as e:
+                    logger.warning(f"Could not get changed characters from {frame_service.name}: {e}")
+            characters = self._get_characters_to_load(frame_service, changed)
+            if characters:
+                try:
+                    await frame_service.prefetch_async(
+                        {character: previous.get(character) for character in characters}, session
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not prefetch frame data from {frame_service.name}: {e}")
+
+            character_results = await asyncio.gather(
+                *(load_character(character, session) for character in characters), return_exceptions=True
+            )
+        loaded = dict(zip(characters, character_results))
+        results: Dict[CharacterName, Character | None | BaseException] = {
+            character: loaded[character] if character in loaded else previous[character] for character in CharacterName
+        }
+
+        # building the lookup structures is CPU-bound, so keep it off the event loop
+        snapshot, report = await asyncio.get_running_loop().run_in_executor(
+            None, self._build_snapshot, results, frame_service.name, retrieved_at, fallback
+        )
+        self._publish(snapshot, report)
+        return report
+
+    def _publish(self, snapshot: FrameDbSnapshot, report: LoadReport) -> None:
+        "Make a snapshot the current one, and drop the cached queries for the characters that changed"
+
+        self._snapshot = snapshot
+        dropped = self.query_cache.discard(lambda key: key[0] in report.changes)
+        logger.debug(f"Dropped {dropped} cached queries for characters whose frame data changed")
+
+    def _get_retrieved_at(self, frame_service: FrameService) -> datetime.datetime | None:
+        "Get when the frame data was last retrieved from a frame service, if it was loaded from it"
+
+        snapshot = self._snapshot
+        return snapshot.retrieved_at if snapshot.source == frame_service.name else None
+
+    def _get_characters_to_load(self, frame_service: FrameService, changed: Set[CharacterName] | None) -> List[CharacterName]:
+        """
+        Get the characters to retrieve from a frame service, given the characters that changed since the last load.
+
+        Every character is retrieved if it isn't known what changed. Characters whose frame data didn't come from the
+        frame service last time, if any, are always retried.
+        """
 
-    def _build_autocomplete(self) -> None:
-        "Builds the autocomplete list for the characters in the frame database."
+        if changed is None:
+            return list(CharacterName)
 
-        words: Dict[str, Dict[str, str]] = {character.pretty().lower(): {} for character in self.frames.keys()}
-        synonyms = {character.pretty().lower(): CHARACTER_ALIAS[character] for character in self.frames.keys()}
-        self.autocomplete = AutoComplete(words=words, synonyms=synonyms)
+        sources = self._snapshot.sources
+        characters = [
+            character
+            for character in CharacterName
+            if character in changed or sources.get(character) is not CharacterSource.PRIMARY
+        ]
+        logger.info(
+            f"{len(changed)} characters changed on {frame_service.name} since the last load, retrieving {len(characters)}"
+        )
+        return characters
+
+    def _build_snapshot(
+        self,
+        results: Dict[CharacterName, Character | None | BaseException],
+        source: str | None = None,
+        retrieved_at: datetime.datetime | None = None,
+        fallback: FrameService | None = None,
+    ) -> Tuple[FrameDbSnapshot, LoadReport]:
+        """
+        Build the next snapshot from the result of loading each character from a frame service.
+
+        A character that failed to load keeps its frame data from the current snapshot, or is loaded from the fallback
+        frame service. Raises an exception if no character could be loaded at all and some failed.
+        """
+
+        previous = self._snapshot
+        frames: Dict[CharacterName, Character] = {}
+        report = LoadReport(sources={})
+        for character, result in results.items():
+            if isinstance(result, BaseException):
+                logger.warning(f"Error in loading frame data for {character.value}: {result}")
+                report.errors[character] = result
+            elif result:
+                frames[character] = result
+                report.sources[character] = CharacterSource.PRIMARY
+                continue
+            else:
+                logger.warning(f"Could not load frame data for {character}")
+
+            if character in previous.frames:
+                frames[character] = previous.frames[character]
+                report.sources[character] = CharacterSource.PREVIOUS
+            elif fallback and (fallback_result := FrameDb._load_fallback_character(fallback, character)):
+                frames[character] = fallback_result
+                report.sources[character] = CharacterSource.FALLBACK
+        if not frames and report.errors:
+            raise Exception("Could not load frame data for any character") from next(iter(report.errors.values()))
+
+        # keep the current object for a character whose content didn't change, so that whatever was built from it is
+        # reused, unless it came from other raw data, whose digest the frame service needs to see next time
+        for character, frame in frames.items():
+            previous_frame = previous.frames.get(character)
+            if (
+                previous_frame is not None
+                and previous_frame.content_hash == frame.content_hash
+                and previous_frame.source_digest == frame.source_digest
+            ):
+                frames[character] = previous_frame
+
+        logger.info(f"Loaded frame data: {report.summary()}")
+        snapshot = FrameDbSnapshot.build(
+            frames,
+            generation=previous.generation + 1,
+            previous=previous,
+            source=source,
+            retrieved_at=retrieved_at,
+            sources=report.sources,
+        )
+        report.changes = snapshot.diff(previous)
+        added = sum(len(diff.added) for diff in report.changes.values())
+        removed = sum(len(diff.removed) for diff in report.changes.values())
+        changed = sum(len(diff.changed) for diff in report.changes.values())
+        logger.info(
+            f"Frame data changed for {len(report.changes)} of {len(frames)} characters: "
+            f"{added} moves added, {removed} removed, {changed} changed"
+        )
+        return snapshot, report
 
     @staticmethod
-    def _simplify_input(input_query: str) -> str:
-        """Removes bells and whistles from a move input query"""
+    def _load_fallback_character(fallback: FrameService, character: CharacterName) -> Character | None:
+        "Load the frame data for a single character from a fallback frame service, if it has any"
 
-        input_query = input_query.strip().lower()
-        input_query = input_query.replace("rage", "r.")
-        input_query = input_query.replace("heat", "h.")
+        try:
+            return fallback.get_frame_data(character)
+        except Exception as e:
+            logger.warning(f"Could not load frame data for {character.value} from {fallback.name}: {e}")
+            return None
 
-        for old, new in REPLACE.items():
-            input_query = input_query.replace(old, new)
+    @staticmethod
+    def _load_character(
+        frame_service: FrameService, character: CharacterName, session: requests.Session, previous: Character | None
+    ) -> Character | None:
+        "Load the frame data for a single character and log how long it took."
+
+        start = time.perf_counter()
+        frames = frame_service.get_frame_data(character, session, previous)
+        logger.info(
+            f"Retrieved frame data for {character.value} from {frame_service.name} in {time.perf_counter() - start:.2f}s"
+        )
+        return frames
+
+    def refresh(
+        self,
+        frame_service: FrameService,
+        export_dir_path: str,
+        format: str = "json",
+        max_workers: int = 1,
+        fallback: FrameService | None = None,
+        compact: bool = False,
+    ) -> LoadReport:
+        "Refresh the frame database using a frame service."
 
-        # cd works, ewgf doesn't, for some reason
-        if input_query[:2].lower() == "cd" and input_query[:3].lower() != "cds":
-            input_query = input_query.lower().replace("cd", "fnddf")
-        if input_query[:2].lower() == "wr":
-            input_query = input_query.lower().replace("wr", "fff")
-        return input_query
+        logger.info(f"Refreshing frame data from {frame_service.name} and exporting to {export_dir_path}")
+        report = self.load(frame_service, max_workers=max_workers, fallback=fallback)
+        self.export(export_dir_path, format=format, compact=compact)
+        return report
+
+    async def refresh_async(
+        self,
+        frame_service: AsyncFrameService,
+        export_dir_path: str,
+        format: str = "json",
+        max_concurrency: int = 1,
+        fallback: FrameService | None = None,
+        compact: bool = False,
+    ) -> LoadReport:
+        "Refresh the frame database using a frame service, as a task on the running event loop."
+
+        logger.info(f"Refreshing frame data from {frame_service.name} and exporting to {export_dir_path}")
+        report = await self.load_async(frame_service, max_concurrency=max_concurrency, fallback=fallback)
+        await asyncio.get_running_loop().run_in_executor(None, self.export, export_dir_path, format, compact)
+        return report
 
     @staticmethod
-    def _is_command_in_alias(move_query: str, move: Move) -> bool:
-        "Check if an input move query is in the alias of the given Move"
+    def _get_move_types(move: Move) -> List[MoveType]:
+        "Classify a move into the move types it belongs to"
 
-        for alias in move.alias:
-            if FrameDb._simplify_input(move_query) == FrameDb._simplify_input(alias):
-                return True
-        return False
+        notes = move.notes.lower()
+        return [
+            move_type for move_type in MoveType if move_type.value.lower() in notes
+        ]  # TODO: revisit this logic for throws (and perhaps others)
 
     @staticmethod
-    def _is_command_in_alt(move_query: str, move: Move) -> bool:
-        "Check if an input move query is in the alt of the given Move"
+    def _simplify_input(input_query: str) -> str:
+        """Removes bells and whistles from a move input query"""
 
-        for alt in move.alt:
-            if FrameDb._simplify_input(move_query) == FrameDb._simplify_input(alt):
-                return True
-        return False
+        return simplify_input(input_query)
 
     @staticmethod
     def _correct_character_name(char_name_query: str) -> str | None:
@@ -108,16 +805,8 @@ class FrameDb:
 
         char_name_query = char_name_query.lower().strip()
         char_name_query = char_name_query.replace(" ", "_")
-        try:
-            return CharacterName(char_name_query).value
-        except ValueError:
-            pass
-
-        for key, value in CHARACTER_ALIAS.items():
-            if char_name_query in value:
-                return key.value
-
-        return None
+        character_name = CHARACTER_NAME_LOOKUP.get(char_name_query)
+        return character_name.value if character_name else None
 
     @staticmethod
     def _correct_move_type(move_type_query: str) -> MoveType | None:
@@ -134,32 +823,21 @@ class FrameDb:
     def get_move_by_input(self, character: CharacterName, input_query: str) -> Move | None:
         """Given an input move query for a known character, retrieve the move from the database."""
 
-        character_movelist = self.frames[character].movelist.values()
+        move, _ = FrameDb._match_input(self._snapshot.indexes[character], input_query)
+        return move
 
-        # compare input directly
-        result = [
-            entry
-            for entry in character_movelist
-            if FrameDb._simplify_input(entry.input) == FrameDb._simplify_input(input_query)
-        ]
-        # simple_inputs = [FrameDb._simplify_input(entry.input) for entry in character_movelist]
-        # simplified_input_query = FrameDb._simplify_input(input_query)
-        # import code; code.interact(local=locals())
-        if result:
-            return result[0]
-
-        # compare alt
-        result = list(filter(lambda x: (FrameDb._is_command_in_alt(input_query, x)), character_movelist))
-        if result:
-            return result[0]
-
-        # compare alias
-        result = list(filter(lambda x: (FrameDb._is_command_in_alias(input_query, x)), character_movelist))
-        if result:
-            return result[0]
+    @staticmethod
+    def _match_input(index: CharacterIndex, input_query: str) -> Tuple[Move | None, int]:
+        "Match an input query exactly against inputs, then alts, then aliases. Costs a single probe of the index."
+
+        entry = index.commands.get(FrameDb._simplify_input(input_query))
+        if entry:
+            tier, move = entry
+            logger.debug(f"Matched {input_query} to {move.id} by {tier.name.lower()}")
+            return move, 1
 
         # couldn't match anything :-(
-        return None
+        return None, 1
 
     def get_moves_by_move_name(self, character: CharacterName, move_name_query: str) -> List[Move]:
         """
@@ -167,23 +845,27 @@ class FrameDb:
         returns a list of Move objects if finds match(es), else empty list
         """
 
-        move_list = self.frames[character].movelist.values()
-        moves = list(filter(lambda x: (move_name_query.lower() in x.name.lower()), move_list))
-
+        moves, _ = FrameDb._match_name(self._snapshot.indexes[character], move_name_query)
         return moves
 
+    @staticmethod
+    def _match_name(index: CharacterIndex, move_name_query: str) -> Tuple[List[Move], int]:
+        "Match a move name query as a substring of move names. Also returns the number of names examined."
+
+        move_name_query = move_name_query.lower()
+        candidates = index.names.candidates(move_name_query)
+        moves = [index.name_moves[idx] for idx in candidates if move_name_query in index.names.strings[idx]]
+        return moves, len(candidates)
+
     def get_moves_by_move_type(self, character: CharacterName, move_type_query: str) -> List[Move]:
         """
         Gets a list of moves that match a move_type query
-        returns a list of Move objects if finds match(es), else empty list
+        returns a list of Move objects sorted by input if finds match(es), else empty list
         """
 
-        move_list = self.frames[character].movelist.values()
         move_type = FrameDb._correct_move_type(move_type_query)
         if move_type:
-            moves = list(
-                filter(lambda x: (move_type.value.lower() in x.notes.lower()), move_list)
-            )  # TODO: revisit this logic for throws (and perhaps others)
+            moves = list(self._snapshot.indexes[character].move_types[move_type])
         else:
             moves = []
 
@@ -199,28 +881,43 @@ class FrameDb:
         else:
             return character_movelist[move_id]
 
-    def get_moves_by_move_input(self, character: CharacterName, input_query: str) -> List[Move]:
+    def get_moves_by_move_input(
+        self, character: CharacterName, input_query: str, n: int = 5, cutoff: float = 0.7
+    ) -> List[Move]:
         """
         Given an input query for a known character, find all moves which are similar to the input query.
+
+        Inputs and alts are both matched, and a move is only returned once at its best score.
         """
 
-        movelist = list(self.frames[character].movelist.values())
-        command_list = [entry.input for entry in movelist]  # TODO: include alts
-        similar_move_indices = _get_close_matches_indices(
-            FrameDb._simplify_input(input_query), list(map(FrameDb._simplify_input, command_list))
-        )
+        moves, _ = FrameDb._match_fuzzy_input(self._snapshot.indexes[character], input_query, n, cutoff)
+        return moves
 
-        result = [movelist[idx] for idx in similar_move_indices]
+    @staticmethod
+    def _match_fuzzy_input(index: CharacterIndex, input_query: str, n: int = 5, cutoff: float = 0.7) -> Tuple[List[Move], int]:
+        "Match an input query fuzzily against inputs and alts. Also returns the number of commands scored."
+
+        fuzzy_index, owners = index.fuzzy_inputs, index.fuzzy_input_moves
+        simplified_query = FrameDb._simplify_input(input_query)
+        candidates = fuzzy_index.candidates(simplified_query, cutoff)
+        similar_command_indices = _get_close_matches_indices(
+            simplified_query,
+            fuzzy_index.strings,
+            n=max(len(fuzzy_index.strings), 1),
+            cutoff=cutoff,
+            candidates=candidates,
+        )
 
-        return result
+        result: Dict[str, Move] = {}
+        for idx in similar_command_indices:
+            result.setdefault(owners[idx].id, owners[idx])
+        return list(result.values())[:n], len(candidates)
 
     def get_character_by_name(self, name_query: str) -> Character | None:
         """Given a character name query, return the corresponding character"""
 
-        for character_name, character in self.frames.items():
-            if character_name.value == FrameDb._correct_character_name(name_query):
-                return character
-        return None
+        character_name = FrameDb._correct_character_name(name_query)
+        return self.frames.get(CharacterName(character_name)) if character_name else None
 
     def get_move_type(self, move_type_query: str) -> MoveType | None:
         """Given a move type query, return the corresponding move type"""
@@ -241,31 +938,84 @@ class FrameDb:
         2. Check if the move query can be matched by name (+ aliases)
         3. Check if the move query can be matched fuzzily by input (+ alts) or name (+ aliases)
         4. If no match is found, return a list of (possibly empty) similar moves.
+
+        Results, including similar moves, are cached until the character's frame data changes. Similar moves are cached
+        as a tuple and returned as a new list, so that callers can't change the cached result.
         """
 
-        moves: Move | List[Move] = []
+        snapshot = self._snapshot
+        content_hash = snapshot.frames[character.name].content_hash
 
-        # check for exact input match
-        character_move = self.get_move_by_input(character.name, move_query)
+        # every stage lowercases the query before matching, so this doesn't merge queries with different results
+        key = (character.name, move_query.lower())
+        cached_moves = self.query_cache.get(key, content_hash)
+        if cached_moves is not None:
+            return list(cached_moves) if isinstance(cached_moves, tuple) else cached_moves
 
-        # check for name match
-        similar_name_moves = self.get_moves_by_move_name(character.name, move_query)
+        moves, trace = self._search_move(snapshot.indexes[character.name], move_query)
+        logger.debug(f"Search trace for {character.name.value}: {trace}")
+        self.query_cache.put(key, content_hash, tuple(moves) if isinstance(moves, list) else moves)
+        return moves
 
-        # check for fuzzy input match
-        similar_input_moves = self.get_moves_by_move_input(character.name, move_query)
+    def search_move_traced(self, character: Character, move_query: str) -> Tuple[Move | List[Move], SearchTrace]:
+        """
+        Search for a move like search_move, and also return a trace of the stages that were evaluated.
+
+        Stages are evaluated lazily, and the search stops at the first stage that resolves the query.
+        """
 
+        return self._search_move(self._snapshot.indexes[character.name], move_query)
+
+    def _search_move(self, index: CharacterIndex, move_query: str) -> Tuple[Move | List[Move], SearchTrace]:
+        "Run the search pipeline against a character's lookup structures"
+
+        trace = SearchTrace(move_query)
+
+        # check for exact input match
+        character_move = self._run_search_stage(trace, SearchStage.INPUT, FrameDb._match_input, index, move_query)
         if character_move:
-            moves = character_move
-        elif len(similar_name_moves) == 1:
-            moves = similar_name_moves[0]
-        else:
-            similar_moves = similar_name_moves + similar_input_moves
-            moves = similar_moves
+            return character_move, trace
 
-        return moves
+        # check for name match
+        similar_name_moves = self._run_search_stage(trace, SearchStage.NAME, FrameDb._match_name, index, move_query)
+        if len(similar_name_moves) == 1:
+            return similar_name_moves[0], trace
+
+        # check for fuzzy input match
+        similar_input_moves = self._run_search_stage(
+            trace, SearchStage.FUZZY_INPUT, FrameDb._match_fuzzy_input, index, move_query
+        )
+        similar_moves = similar_name_moves + similar_input_moves
+        return similar_moves, trace
+
+    def _run_search_stage(
+        self,
+        trace: SearchTrace,
+        stage: SearchStage,
+        match: Callable[[CharacterIndex, str], Tuple[T, int]],
+        index: CharacterIndex,
+        move_query: str,
+    ) -> T:
+        "Run a stage of the search pipeline, recording it in the trace and the search statistics."
+
+        start = time.perf_counter()
+        result, candidates = match(index, move_query)
+        duration = time.perf_counter() - start
+
+        trace.stage = stage
+        trace.candidates[stage] = candidates
+        trace.durations[stage] = duration
+
+        stats = self.search_stats[stage]
+        stats.runs += 1
+        stats.candidates += candidates
+        stats.duration += duration
+        return result
 
 
-def _get_close_matches_indices(word: str, possibilities: List[str], n: int = 5, cutoff: float = 0.7) -> List[int]:
+def _get_close_matches_indices(
+    word: str, possibilities: List[str], n: int = 5, cutoff: float = 0.7, candidates: Iterable[int] | None = None
+) -> List[int]:
     """
     Use SequenceMatcher to return a list of the indexes of the best
     "good enough" matches.
@@ -281,6 +1031,9 @@ def _get_close_matches_indices(word: str, possibilities: List[str], n: int = 5,
 
     Optional arg cutoff (default 0.7) is a float in [0, 1].  Possibilities
     that don't score at least that similar to word are ignored.
+
+    Optional arg candidates is an iterable of indexes into possibilities
+    (default all of them).  Only these possibilities are scored.
     """
 
     if not n > 0:
@@ -290,8 +1043,8 @@ def _get_close_matches_indices(word: str, possibilities: List[str], n: int = 5,
     result = []
     s = SequenceMatcher()
     s.set_seq2(word)
-    for idx, x in enumerate(possibilities):
-        s.set_seq1(x)
+    for idx in range(len(possibilities)) if candidates is None else candidates:
+        s.set_seq1(possibilities[idx])
         if s.real_quick_ratio() >= cutoff and s.quick_ratio() >= cutoff and s.ratio() >= cutoff:
             result.append((s.ratio(), idx))
 
@@ -0,0 +1,123 @@
+"""
+Lookup structures built over a character's movelist when the frame database is loaded.
+"""
+
+import collections
+from typing import Counter, Dict, List, Sequence, Tuple
+
+"Padding character for q-grams, so that the start and end of a string produce q-grams of their own"
+QGRAM_PAD = "\x00"
+
+
+def _ratio(matches: int, length: int) -> float:
+    "The similarity ratio as computed by difflib.SequenceMatcher.ratio"
+
+    return 2.0 * matches / length if length else 1.0
+
+
+class QGramIndex:
+    """
+    An inverted index from padded q-grams to the strings that contain them.
+
+    Used to narrow down the strings that could possibly be similar enough to a word before scoring them with
+    difflib.SequenceMatcher, which is expensive.
+    """
+
+    def __init__(self, strings: Sequence[str], q: int = 3) -> None:
+        if not q > 0:
+            raise ValueError("q must be > 0: %r" % (q,))
+        self.q = q
+        self.strings = list(strings)
+        self._postings: Dict[str, List[Tuple[int, int]]] = collections.defaultdict(list)
+        self._by_length: Dict[int, List[int]] = collections.defaultdict(list)
+        for idx, string in enumerate(self.strings):
+            self._by_length[len(string)].append(idx)
+            for qgram, count in self._qgrams(string).items():
+                self._postings[qgram].append((idx, count))
+
+    def _qgrams(self, string: str) -> Counter[str]:
+        padded = QGRAM_PAD * (self.q - 1) + string + QGRAM_PAD * (self.q - 1)
+        return collections.Counter(padded[i : i + self.q] for i in range(len(padded) - self.q + 1))
+
+    def _min_common_qgrams(self, word_length: int, length: int, cutoff: float) -> int | None:
+        """
+        The fewest q-grams a string of a given length must share with a word for their ratio to reach the cutoff.
+
+        Returns None if no string of that length can reach the cutoff. SequenceMatcher only ever matches characters
+        of a common subsequence, so a ratio above the cutoff needs a common subsequence of at least `matches`
+        characters. Every character outside of it destroys at most q padded q-grams of its own string and q - 1 of the
+        other's, which bounds the number of q-grams that survive in both.
+        """
+
+        total = word_length + length
+        matches = next((m for m in range(min(word_length, length) + 1) if _ratio(m, total) >= cutoff), None)
+        if matches is None:
+            return None
+        q = self.q
+        return max(
+            word_length + q - 1 - q * (word_length - matches) - (q - 1) * (length - matches),
+            length + q - 1 - q * (length - matches) - (q - 1) * (word_length - matches),
+        )
+
+    def candidates(self, word: str, cutoff: float) -> List[int]:
+        "Get the indices of the strings whose similarity ratio to a word could reach the cutoff, in index order"
+
+        common: Dict[int, int] = collections.defaultdict(int)
+        for qgram, count in self._qgrams(word).items():
+            for idx, string_count in self._postings.get(qgram, ()):
+                common[idx] += min(count, string_count)
+
+        thresholds = {length: self._min_common_qgrams(len(word), length, cutoff) for length in self._by_length}
+        result = [
+            idx
+            for length, indices in self._by_length.items()
+            if (threshold := thresholds[length]) is not None and threshold <= 0
+            for idx in indices
+        ]
+        result.extend(
+            idx
+            for idx, count in common.items()
+            if (threshold := thresholds[len(self.strings[idx])]) is not None and 0 < threshold <= count
+        )
+        return sorted(result)
+
+
+class SubstringIndex:
+    """
+    An index of strings by all of their n-grams up to length q, that answers substring queries.
+
+    A substring of up to q characters is looked up directly. A longer substring narrows the search down to the strings
+    containing all of its q-grams, which are then checked for the whole substring.
+    """
+
+    def __init__(self, strings: Sequence[str], q: int = 3) -> None:
+        if not q > 0:
+            raise ValueError("q must be > 0: %r" % (q,))
+        self.q = q
+        self.strings = list(strings)
+        self._postings: Dict[str, List[int]] = collections.defaultdict(list)
+        for idx, string in enumerate(self.strings):
+            ngrams = {string[i : i + n] for n in range(1, q + 1) for i in range(len(string) - n + 1)}
+            for ngram in ngrams:
+                self._postings[ngram].append(idx)
+
+    def candidates(self, substring: str) -> List[int]:
+        "Get the indices of the strings that could contain a substring, in index order"
+
+        if not substring:
+            return list(range(len(self.strings)))
+        elif len(substring) <= self.q:
+            return list(self._postings.get(substring, ()))
+
+        postings = sorted(
+            (self._postings.get(substring[i : i + self.q], []) for i in range(len(substring) - self.q + 1)), key=len
+        )
+        return sorted(set(postings[0]).intersection(*postings[1:]))
+
+    def search(self, substring: str) -> List[int]:
+        "Get the indices of the strings that contain a substring, in index order"
+
+        candidates = self.candidates(substring)
+        if len(substring) <= self.q:
+            return candidates
+        return [idx for idx in candidates if substring in self.strings[idx]]
@@ -0,0 +1,31 @@
+"""
+Normalization of move notation so that queries can be matched against movelist inputs.
+"""
+
+import functools
+from typing import List, Tuple
+
+from .const import REPLACE
+
+"The substitutions applied to a lowercased input, in order"
+SIMPLIFY_RULES: List[Tuple[str, str]] = [("rage", "r."), ("heat", "h.")] + list(REPLACE.items())
+
+"How many distinct inputs to remember the simplified form of, enough to cover every command of every character"
+SIMPLIFY_CACHE_SIZE = 16384
+
+
+@functools.lru_cache(maxsize=SIMPLIFY_CACHE_SIZE)
+def simplify_input(input_query: str) -> str:
+    """Removes bells and whistles from a move input query"""
+
+    input_query = input_query.strip().lower()
+    # str.replace is fast enough for short notation that a chain of them beats a compiled regex
+    for old, new in SIMPLIFY_RULES:
+        input_query = input_query.replace(old, new)
+
+    # cd works, ewgf doesn't, for some reason
+    if input_query[:2] == "cd" and input_query[:3] != "cds":
+        input_query = input_query.replace("cd", "fnddf")
+    if input_query[:2] == "wr":
+        input_query = input_query.replace("wr", "fff")
+    return input_query
@@ -0,0 +1,44 @@
+import pytest
+
+from framedb.cache import QueryCache
+
+
+def test_query_cache_hit_and_miss() -> None:
+    cache: QueryCache[str, int] = QueryCache(maxsize=2)
+    assert cache.get("df1", 0) is None
+    cache.put("df1", 0, 1)
+    assert cache.get("df1", 0) == 1
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 0)
+
+
+def test_query_cache_evicts_least_recently_used() -> None:
+    cache: QueryCache[str, int] = QueryCache(maxsize=2)
+    cache.put("df1", 0, 1)
+    cache.put("b1", 0, 2)
+    cache.get("df1", 0)
+    cache.put("ws2", 0, 3)
+    assert cache.get("b1", 0) is None
+    assert cache.get("df1", 0) == 1
+    assert cache.evictions == 1
+    assert len(cache) == 2
+
+
+def test_query_cache_invalidates_older_generations() -> None:
+    cache: QueryCache[str, int] = QueryCache()
+    cache.put("df1", 0, 1)
+    assert cache.get("df1", 1) is None
+    assert len(cache) == 0
+
+
+def test_query_cache_invalid_size() -> None:
+    with pytest.raises(ValueError):
+        QueryCache(maxsize=0)
+
+
+def test_query_cache_discard() -> None:
+    cache: QueryCache[str, int] = QueryCache()
+    cache.put("df1", 0, 1)
+    cache.put("df2", 0, 2)
+    cache.put("b1", 0, 3)
+    assert cache.discard(lambda key: key.startswith("df")) == 2
+    assert len(cache) == 1 and cache.get("b1", 0) == 3
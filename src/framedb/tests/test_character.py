@@ -0,0 +1,52 @@
+import dataclasses
+
+from framedb import Character, CharacterName, Move, MovelistDiff
+from framedb.character import MoveTree
+
+
+def _movelist(parents: dict[str, str]) -> dict[str, Move]:
+    return {move_id: Move(move_id, move_id, parent=parent) for move_id, parent in parents.items()}
+
+
+def test_move_tree() -> None:
+    tree = MoveTree.build(_movelist({"1": "", "1,2": "1", "1,1": "1", "1,2,1": "1,2", "2": "", "3,1": "3"}))
+    assert tree.parents == {"1,2": "1", "1,1": "1", "1,2,1": "1,2"}  # 3 isn't in the movelist
+    assert tree.children == {"1": ("1,2", "1,1"), "1,2": ("1,2,1",)}
+    assert tree.roots == {"1": "1", "1,2": "1", "1,1": "1", "1,2,1": "1", "2": "2", "3,1": "3,1"}
+
+
+def test_move_tree_with_cycle() -> None:
+    tree = MoveTree.build(_movelist({"a": "c", "b": "a", "c": "b", "d": "c"}))
+    assert set(tree.roots) == {"a", "b", "c", "d"}
+    assert len(set(tree.roots.values())) == 1
+
+
+def test_character_move_tree() -> None:
+    character = Character(CharacterName.AZUCENA, "", _movelist({"1": "", "1,2": "1", "1,2,1": "1,2"}), "")
+    assert [move.id for move in character.get_children("1")] == ["1,2"]
+    assert character.get_children("1,2,1") == []
+    parent = character.get_parent("1,2,1")
+    assert parent and parent.id == "1,2"
+    assert character.get_parent("1") is None
+    root = character.get_root("1,2,1")
+    assert root and root.id == "1"
+    assert character.get_root("unknown") is None
+
+
+def test_character_content_hash() -> None:
+    movelist = _movelist({"1": "", "1,2": "1"})
+    character = Character(CharacterName.AZUCENA, "", movelist, "")
+    assert Character(CharacterName.AZUCENA, "", _movelist({"1": "", "1,2": "1"}), "").content_hash == character.content_hash
+    assert Character(CharacterName.AZUCENA, "", dict(reversed(movelist.items())), "").content_hash != character.content_hash
+    assert Character(CharacterName.ASUKA, "", movelist, "").content_hash != character.content_hash
+    assert character.move_hashes["1"] != character.move_hashes["1,2"]
+
+
+def test_character_diff() -> None:
+    old = Character(CharacterName.AZUCENA, "", _movelist({"1": "", "1,2": "1", "2": ""}), "")
+    movelist = _movelist({"1": "", "1,2": "1", "3": ""})
+    movelist["1,2"] = dataclasses.replace(movelist["1,2"], on_block="-10")
+    new = Character(CharacterName.AZUCENA, "", movelist, "")
+    assert new.diff(old) == MovelistDiff(added=("3",), removed=("2",), changed=("1,2",))
+    assert new.diff(new) == MovelistDiff() and not new.diff(new)
+    assert old.diff(None) == MovelistDiff(added=("1", "1,2", "2"))
@@ -1,4 +1,12 @@
-from framedb.const import CHARACTER_ALIAS, MOVE_TYPE_ALIAS, NUM_CHARACTERS, SORT_ORDER, CharacterName, MoveType
+from framedb.const import (
+    CHARACTER_ALIAS,
+    CHARACTER_NAME_LOOKUP,
+    MOVE_TYPE_ALIAS,
+    NUM_CHARACTERS,
+    SORT_ORDER,
+    CharacterName,
+    MoveType,
+)
 
 
 def test_all_characters_exist() -> None:
@@ -11,6 +19,13 @@ def test_aliases_for_all_chars() -> None:
         assert char in CHARACTER_ALIAS
 
 
+def test_character_name_lookup() -> None:
+    for char in CharacterName:
+        assert CHARACTER_NAME_LOOKUP[char.value] == char
+        for alias in CHARACTER_ALIAS[char]:
+            assert alias in CHARACTER_NAME_LOOKUP
+
+
 def test_all_move_types_exist() -> None:
     assert len(MoveType) == len(MOVE_TYPE_ALIAS)
     assert len(SORT_ORDER) == len(MOVE_TYPE_ALIAS)
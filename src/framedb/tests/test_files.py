@@ -0,0 +1,30 @@
+import os
+import pathlib
+import stat
+
+import pytest
+
+from framedb.files import write_atomically
+
+
+def test_write_atomically(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "azucena.json"
+    path.write_text("old")
+    write_atomically(str(path), b"new")
+    assert path.read_bytes() == b"new"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_write_atomically_honours_umask(tmp_path: pathlib.Path) -> None:
+    old_umask = os.umask(0o022)
+    try:
+        write_atomically(str(tmp_path / "azucena.json"), b"[]")
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE((tmp_path / "azucena.json").stat().st_mode) == 0o644
+
+
+def test_write_atomically_cleans_up_on_failure(tmp_path: pathlib.Path) -> None:
+    with pytest.raises(IsADirectoryError):
+        write_atomically(str(tmp_path), b"[]")  # can't replace a directory with a file
+    assert not list(tmp_path.parent.glob(f".{tmp_path.name}.*.tmp"))
@@ -0,0 +1,44 @@
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+from framedb.index import QGramIndex, SubstringIndex
+
+
+def _brute_force_matches(word: str, strings: list[str], cutoff: float) -> list[int]:
+    return [idx for idx, string in enumerate(strings) if SequenceMatcher(None, string, word).ratio() >= cutoff]
+
+
+@pytest.mark.parametrize("cutoff", [0.5, 0.7, 0.9])
+def test_qgram_candidates_never_miss_a_match(cutoff: float) -> None:
+    rng = random.Random(2405)
+    alphabet = "dfub1234+,:"
+    strings = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12))) for _ in range(300)]
+    index = QGramIndex(strings)
+    for word in strings[:50] + ["", "d", "df1", "b+1+2,1"]:
+        candidates = index.candidates(word, cutoff)
+        assert set(_brute_force_matches(word, strings, cutoff)) <= set(candidates)
+        assert candidates == sorted(candidates)
+
+
+def test_qgram_candidates_prune() -> None:
+    index = QGramIndex(["df1", "df12", "ws2", "b12", "uf4", "ssr1+2"])
+    assert index.candidates("df1", 0.7) == [0, 1]
+
+
+def test_qgram_invalid_q() -> None:
+    with pytest.raises(ValueError):
+        QGramIndex([], q=0)
+
+
+def test_substring_index_matches_linear_scan() -> None:
+    strings = ["left right > axe kick", "jab", "", "axe", "heat smash", "axel"]
+    index = SubstringIndex(strings)
+    for query in ["", "a", "ax", "axe", "axe ", "e kick", "smash", "zzzz", "jab", "left right > axe kick!"]:
+        assert index.search(query) == [idx for idx, string in enumerate(strings) if query in string]
+
+
+def test_substring_index_invalid_q() -> None:
+    with pytest.raises(ValueError):
+        SubstringIndex([], q=0)
@@ -0,0 +1,74 @@
+import glob
+import json
+import os
+import random
+from typing import List
+
+import pytest
+
+import frame_service.wavu.utils as utils
+from framedb.const import REPLACE
+from framedb.notation import simplify_input
+
+SRC_BASE = os.path.join(os.path.dirname(__file__), "..", "..")
+
+
+def _reference_simplify_input(input_query: str) -> str:
+    "The original sequential implementation of FrameDb._simplify_input"
+
+    input_query = input_query.strip().lower()
+    input_query = input_query.replace("rage", "r.")
+    input_query = input_query.replace("heat", "h.")
+
+    for old, new in REPLACE.items():
+        input_query = input_query.replace(old, new)
+
+    if input_query[:2].lower() == "cd" and input_query[:3].lower() != "cds":
+        input_query = input_query.lower().replace("cd", "fnddf")
+    if input_query[:2].lower() == "wr":
+        input_query = input_query.lower().replace("wr", "fff")
+    return input_query
+
+
+def _fixture_commands() -> List[str]:
+    "Collect every input, alt and alias in the test fixtures"
+
+    commands = []
+    for path in glob.glob(os.path.join(SRC_BASE, "frame_service", "wavu", "tests", "static", "*.json")):
+        with open(path, encoding="utf-8") as f:
+            movelist = utils._get_wavu_character_movelist(json.load(f))
+        for move in movelist.values():
+            commands += [move.input, *move.alt, *move.alias]
+    for pattern in [
+        os.path.join("frame_service", "json_directory", "tests", "static", "json_movelist", "*.json"),
+        os.path.join("heihachi", "tests", "static", "*.json"),
+    ]:
+        for path in glob.glob(os.path.join(SRC_BASE, pattern)):
+            with open(path, encoding="utf-8") as f:
+                contents = json.load(f)
+            for move in contents if isinstance(contents, list) else []:
+                commands += [move["input"], *move.get("alt", []), *move.get("alias", [])]
+    return commands
+
+
+def test_simplify_input_matches_reference_on_fixtures() -> None:
+    commands = _fixture_commands()
+    assert len(commands) > 4000
+    for command in commands:
+        assert simplify_input(command) == _reference_simplify_input(command), command
+
+
+def test_simplify_input_matches_reference_on_random_notation() -> None:
+    rng = random.Random(2405)
+    alphabet = list("dfubnwscra+ ,/()*.hetg12349") + ["rage", "heat", "ws", "fc", "cd", "wr", "fff", "ss", "ra"]
+    for _ in range(20000):
+        query = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 10)))
+        assert simplify_input(query) == _reference_simplify_input(query), query
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [("df+1", "df1"), ("d/f+1, 2", "df12"), ("f+c+", "fc"), ("cd+4", "fnddf4"), ("f,f,f+2", "fff2"), ("rage art", "rart")],
+)
+def test_simplify_input(query: str, expected: str) -> None:
+    assert simplify_input(query) == expected
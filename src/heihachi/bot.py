@@ -12,6 +12,7 @@ from framedb.const import CharacterName
 from heihachi import button, embed
 from heihachi.configurator import Configurator
 from heihachi.embed import get_frame_data_embed
+from heihachi.scheduler import RefreshScheduler
 
 logger = logging.getLogger("main")
 
@@ -22,6 +23,7 @@ class FrameDataBot(discord.Client):
         framedb: FrameDb,
         frame_service: FrameService,
         config: Configurator,
+        scheduler: RefreshScheduler | None = None,
     ) -> None:
         intents = discord.Intents.default()
         intents.message_content = False
@@ -30,6 +32,7 @@ class FrameDataBot(discord.Client):
         self.framedb = framedb
         self.frame_service = frame_service
         self.config = config
+        self.scheduler = scheduler
         self.synced = False
         self.tree = discord.app_commands.CommandTree(self)
 
@@ -41,6 +44,15 @@ class FrameDataBot(discord.Client):
 
         logger.debug(f"Bot command tree: {[command.name for command in self.tree.get_commands()]}")
 
+    async def setup_hook(self) -> None:
+        if self.scheduler:
+            self.scheduler.start()
+
+    async def close(self) -> None:
+        if self.scheduler:
+            await self.scheduler.stop()
+        await super().close()
+
     async def on_ready(self) -> None:
         await self.wait_until_ready()
         if not self.synced:
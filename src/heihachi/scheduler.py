@@ -0,0 +1,143 @@
+"""
+A scheduler that refreshes the frame data periodically on the bot's event loop.
+"""
+
+import asyncio
+import collections
+import datetime
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Deque
+
+logger = logging.getLogger("main")
+
+"How many of the most recent refresh durations to keep"
+DURATION_HISTORY = 16
+
+
+class RefreshScheduler:
+    """
+    Runs a refresh coroutine every interval seconds, give or take a random jitter, as a task on the running event loop.
+
+    The refresh is expected to keep its CPU-bound work off the event loop, e.g., FrameDb.refresh_async. Refreshes never
+    overlap: a refresh that is triggered while another is running is skipped. After a failure, the refresh is retried
+    after retry_delay seconds, doubling with every consecutive failure up to the interval.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[], Awaitable[Any]],
+        interval: float,
+        jitter: float = 0.1,
+        retry_delay: float = 60.0,
+    ) -> None:
+        if not interval > 0:
+            raise ValueError("interval must be > 0: %r" % (interval,))
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter must be in [0, 1): %r" % (jitter,))
+        self.interval = interval
+        self.jitter = jitter
+        self.retry_delay = min(retry_delay, interval)
+        self._refresh = refresh
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+        "When the last refresh started and finished, if one has run"
+        self.last_started_at: datetime.datetime | None = None
+        self.last_finished_at: datetime.datetime | None = None
+
+        "When the next scheduled refresh is due, if the scheduler is running"
+        self.next_refresh_at: datetime.datetime | None = None
+
+        "How long the most recent refreshes took, in seconds, oldest first"
+        self.durations: Deque[float] = collections.deque(maxlen=DURATION_HISTORY)
+
+        "The number of refreshes that failed in a row, and the error the last one failed with"
+        self.consecutive_failures = 0
+        self.last_error: BaseException | None = None
+
+    @property
+    def last_duration(self) -> float | None:
+        "How long the last refresh took, in seconds, if one has run"
+
+        return self.durations[-1] if self.durations else None
+
+    @property
+    def is_refreshing(self) -> bool:
+        return self._lock.locked()
+
+    def get_delay(self) -> float:
+        "Get the number of seconds to wait until the next refresh, backing off after failures"
+
+        if self.consecutive_failures:
+            delay = min(self.retry_delay * 2.0 ** (self.consecutive_failures - 1), self.interval)
+        else:
+            delay = self.interval
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def start(self) -> None:
+        "Start refreshing periodically, as a task on the running event loop"
+
+        if self._task is not None and not self._task.done():
+            raise Exception("Refresh scheduler is already running")
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="frame-data-refresh")
+        logger.info(f"Frame data refresh scheduled every {self.interval:.0f}s")
+
+    async def stop(self) -> None:
+        "Stop refreshing, cancelling a refresh that is in progress"
+
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.next_refresh_at = None
+        logger.info("Frame data refresh stopped")
+
+    def trigger(self) -> None:
+        "Make the scheduler refresh now instead of waiting for the next scheduled refresh"
+
+        self._wakeup.set()
+
+    async def refresh(self) -> bool:
+        "Refresh now, unless a refresh is already running. Returns whether the refresh ran and succeeded."
+
+        if self._lock.locked():
+            logger.info("Frame data refresh is already running, skipping")
+            return False
+        async with self._lock:
+            self.last_started_at = datetime.datetime.now(datetime.timezone.utc)
+            start = time.perf_counter()
+            try:
+                await self._refresh()
+            except Exception as e:
+                self.consecutive_failures += 1
+                self.last_error = e
+                logger.exception(f"Frame data refresh failed ({self.consecutive_failures} in a row)")
+                return False
+            else:
+                self.consecutive_failures = 0
+                self.last_error = None
+                return True
+            finally:
+                self.durations.append(time.perf_counter() - start)
+                self.last_finished_at = datetime.datetime.now(datetime.timezone.utc)
+                logger.info(f"Frame data refresh finished in {self.durations[-1]:.2f}s")
+
+    async def _run(self) -> None:
+        while True:
+            delay = self.get_delay()
+            self.next_refresh_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=delay)
+            logger.debug(f"Next frame data refresh at {self.next_refresh_at.isoformat()}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                logger.info("Frame data refresh triggered")
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.refresh()
@@ -0,0 +1,105 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from heihachi.scheduler import RefreshScheduler
+
+
+def test_refresh_records_times() -> None:
+    async def refresh() -> None:
+        await asyncio.sleep(0)
+
+    async def run() -> RefreshScheduler:
+        scheduler = RefreshScheduler(refresh, interval=3600)
+        assert await scheduler.refresh()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.last_started_at and scheduler.last_finished_at
+    assert scheduler.last_started_at <= scheduler.last_finished_at
+    assert scheduler.last_duration is not None and len(scheduler.durations) == 1
+    assert scheduler.consecutive_failures == 0 and scheduler.last_error is None
+
+
+def test_refreshes_do_not_overlap() -> None:
+    running: List[int] = []
+    max_running = 0
+
+    async def refresh() -> None:
+        nonlocal max_running
+        running.append(1)
+        max_running = max(max_running, len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    async def run() -> List[bool]:
+        scheduler = RefreshScheduler(refresh, interval=3600)
+        return list(await asyncio.gather(scheduler.refresh(), scheduler.refresh()))
+
+    assert asyncio.run(run()) == [True, False]
+    assert max_running == 1
+
+
+def test_backoff_after_failures() -> None:
+    async def refresh() -> None:
+        raise Exception("Frame service is down")
+
+    async def run() -> RefreshScheduler:
+        scheduler = RefreshScheduler(refresh, interval=3600, jitter=0, retry_delay=60)
+        assert scheduler.get_delay() == 3600
+        for _ in range(3):
+            assert not await scheduler.refresh()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.consecutive_failures == 3
+    assert isinstance(scheduler.last_error, Exception)
+    assert scheduler.get_delay() == 240
+    scheduler.consecutive_failures = 10
+    assert scheduler.get_delay() == 3600
+
+
+def test_delay_has_jitter() -> None:
+    async def refresh() -> None:
+        pass
+
+    scheduler = RefreshScheduler(refresh, interval=100, jitter=0.2)
+    delays = [scheduler.get_delay() for _ in range(100)]
+    assert all(80 <= delay <= 120 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_trigger() -> None:
+    refreshed = 0
+
+    async def refresh() -> None:
+        nonlocal refreshed
+        refreshed += 1
+
+    async def run() -> RefreshScheduler:
+        scheduler = RefreshScheduler(refresh, interval=3600)
+        scheduler.start()
+        await asyncio.sleep(0)
+        assert scheduler.next_refresh_at is not None
+        scheduler.trigger()
+        for _ in range(100):
+            if refreshed:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert refreshed == 1
+    assert scheduler.next_refresh_at is None
+
+
+def test_invalid_interval() -> None:
+    async def refresh() -> None:
+        pass
+
+    with pytest.raises(ValueError):
+        RefreshScheduler(refresh, interval=0)
+    with pytest.raises(ValueError):
+        RefreshScheduler(refresh, interval=1, jitter=1)
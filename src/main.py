@@ -3,19 +3,18 @@
 """The entry point for the bot."""
 
 import argparse
+import functools
 import logging
 import os
-import sched
-import threading
-import time
 import traceback
-from typing import Any, Callable, Tuple
 
 import frame_service.wavu.wavu as wavu
 from frame_service import JsonDirectory, Wavu
+from frame_service.wavu.cache import DEFAULT_CACHE_TTL_SEC, ResponseCache
 from framedb import FrameDb
 from heihachi.bot import FrameDataBot
 from heihachi.configurator import Configurator
+from heihachi.scheduler import RefreshScheduler
 
 "How often to update the bot's frame data from the external service and write to file."
 UPDATE_INTERVAL_SEC = 3600
@@ -30,16 +29,6 @@ logger.addHandler(stream_handler)
 logger.setLevel(logging.DEBUG)
 
 
-def periodic_function(
-    scheduler: sched.scheduler, interval: float, function: Callable[..., Any], args: Tuple[Any, ...]
-) -> None:
-    "Run a function periodically"
-
-    while True:
-        scheduler.enter(interval, 1, function, args)
-        scheduler.run()
-
-
 def get_argparser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Heihachi bot")
     parser.add_argument("config_file", type=str, help="Path to the config file")
@@ -49,7 +38,48 @@ def get_argparser() -> argparse.ArgumentParser:
         default=os.path.join(os.getcwd(), "json_movelist"),
         help="Path to the directory to export frame data to",
     )
-    parser.add_argument("--format", type=str, default="json", help="Format to export frame data to")
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="json",
+        help="Format to export frame data to. The snapshot format is also loaded on startup, if it is up to date.",
+    )
+    parser.add_argument(
+        "--compact",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Export frame data compactly rather than indented for readability",
+    )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=4,
+        help="Maximum number of characters to fetch from the frame service at once",
+    )
+    parser.add_argument(
+        "--parse_workers",
+        type=int,
+        default=2,
+        help="Number of processes to parse frame data in, or 0 to parse it in the bot's process",
+    )
+    parser.add_argument(
+        "--bulk_fetch",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Fetch the frame data of all characters in a few large requests rather than one request per character",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=os.path.join(os.getcwd(), "wavu_cache"),
+        help="Path to the directory to cache raw responses from the frame service in",
+    )
+    parser.add_argument(
+        "--cache_ttl",
+        type=float,
+        default=DEFAULT_CACHE_TTL_SEC,
+        help="How long cached responses can be used for on startup, in seconds",
+    )
     return parser
 
 
@@ -59,6 +89,12 @@ def main() -> None:
     config_file_path = args.config_file
     export_dir_path = args.export_dir
     _format = args.format
+    compact = args.compact
+    max_workers = args.max_workers
+    parse_workers = args.parse_workers
+    bulk_fetch = args.bulk_fetch
+    cache_dir = args.cache_dir
+    cache_ttl = args.cache_ttl
 
     # retrieve config
     try:
@@ -69,43 +105,54 @@ def main() -> None:
         logger.error(f"Config file not found at {config_file_path}. Exiting...")
         exit(1)
 
-    # load frame data
+    # create the frame service, and the last export to fall back to for characters that fail to load
     try:
-        frame_service = Wavu()
+        frame_service = Wavu(cache=ResponseCache(cache_dir, ttl=cache_ttl), parse_workers=parse_workers, bulk_fetch=bulk_fetch)
         backup_frame_service = JsonDirectory(wavu.WAVU_CHARACTER_META_PATH, export_dir_path)
-        framedb = FrameDb()
-        framedb.refresh(frame_service, export_dir_path, _format)
-        logger.info(f"Frame data loaded from service {frame_service.name} and written to {export_dir_path} as {_format}")
     except Exception as e:
-        logger.warning(f"Error in loading frame data: \n{traceback.format_exc()}")
-        logger.warning(f"Attempting to load from backup frame service...")
-        try:
-            framedb.load(backup_frame_service)
-            logger.info(f"Frame data loaded from backup service {backup_frame_service.name}")
-        except Exception as e:
-            logger.error(f"Failed to load frame data from backup service: \n{traceback.format_exc()}")
-            exit(1)
+        logger.error(f"Failed to create frame service: \n{traceback.format_exc()}")
+        exit(1)
 
-    # initialize bot
+    # load frame data from the last snapshot, or from the frame service
     try:
-        hei = FrameDataBot(framedb, frame_service, config)
+        framedb = FrameDb()
+        loaded_snapshot = _format == "snapshot" and framedb.load_snapshot(export_dir_path)
+        if not loaded_snapshot:
+            report = framedb.refresh(
+                frame_service, export_dir_path, _format, max_workers, fallback=backup_frame_service, compact=compact
+            )
+            logger.info(f"Frame data loaded from service {frame_service.name} and written to {export_dir_path} as {_format}")
+            if report.errors or report.missing:
+                logger.warning(f"Frame data was not fully loaded from {frame_service.name}: {report.summary()}")
     except Exception as e:
-        logger.error(f"Failed to initialize bot: {e}")
+        logger.error(f"Failed to load frame data: \n{traceback.format_exc()}")
+        frame_service.close()
         exit(1)
 
-    # schedule and start the frame data refresh thread
-    try:
-        scheduler = sched.scheduler(time.time, time.sleep)
-        scheduler_thread = threading.Thread(
-            target=periodic_function,
-            daemon=True,
-            args=(scheduler, UPDATE_INTERVAL_SEC, framedb.refresh, (frame_service, export_dir_path, _format)),
-        )
-        scheduler_thread.start()
-        logger.info(f"Frame data refresh thread started with tid: {scheduler_thread.native_id}")
+    # schedule the frame data refresh on the bot's event loop
+    scheduler = RefreshScheduler(
+        functools.partial(
+            framedb.refresh_async,
+            frame_service,
+            export_dir_path,
+            _format,
+            max_workers,
+            fallback=backup_frame_service,
+            compact=compact,
+        ),
+        UPDATE_INTERVAL_SEC,
+    )
+    if loaded_snapshot:
+        # the snapshot may be stale, so bring it up to date as soon as the bot is running
+        scheduler.trigger()
 
+    # initialize bot
+    try:
+        hei = FrameDataBot(framedb, frame_service, config, scheduler)
     except Exception as e:
-        logger.error(f"Error in scheduling the frame refresh thread: \n{traceback.format_exc()}")
+        logger.error(f"Failed to initialize bot: {e}")
+        frame_service.close()
+        exit(1)
 
     # start the bot
     try:
@@ -113,6 +160,9 @@ def main() -> None:
         hei.run(config.discord_token)
     except Exception as e:
         logger.error(f"Error in running the bot: \n{traceback.format_exc()}")
+    finally:
+        # shut down the parse pool, which outlives the bot's event loop
+        frame_service.close()
     logger.info("Bot stopped")
 
 